@@ -1,98 +1,416 @@
+import argparse
+import itertools
+import json
+import os
+import shutil
+import time
+import joblib
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-from sklearn.cluster import KMeans
+import sklearn
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+from sklearn.cluster import KMeans, MiniBatchKMeans, kmeans_plusplus
 from sklearn.ensemble import IsolationForest
+from sklearn.metrics import calinski_harabasz_score, davies_bouldin_score, silhouette_score
 from sklearn.preprocessing import StandardScaler
-import joblib
-import numpy as np
+from threadpoolctl import threadpool_limits
 
-# ------------------------------
-# 1. Load dataset
-# ------------------------------
-df = pd.read_csv("../dataset/csv/angeles_barangay_rainfall_discharge.csv", parse_dates=["time"])
+from features import (
+    FEATURE_COLS, SOURCE_COLUMNS, SOURCE_DATASET, WEIGHTINGS,
+    apply_weights, build_features, cached_feature_matrix, dataset_fingerprint,
+)
+
+# Artifact names match server/config.py so a bundle can be copied as-is
+KMEANS_FILE = "flood_kmeans.pkl"
+ISO_FILE = "flood_isolationforest.pkl"
+SCALER_FILE = "flood_scaler.pkl"
+
+RUNS_DIR = Path(__file__).resolve().parent / "runs"
+METRIC_SAMPLE = 10_000
+
+# server/config.py RISK_MAP: cluster id -> label, so a drop-in bundle needs
+# exactly these clusters, numbered from lowest to highest risk
+RISK_LEVELS = ["Low", "Medium", "High"]
 
-# ------------------------------
-# 2. Preprocessing
-# ------------------------------
-df["month"] = df["time"].dt.month
-df["day_of_year"] = df["time"].dt.dayofyear
-df["weekday"] = df["time"].dt.weekday
-df.fillna(0, inplace=True)
 
 # ------------------------------
-# 3. Feature weighting (emphasize rainfall & discharge)
+# 1. Fit a single configuration
 # ------------------------------
-df["precip_weighted"] = df["precip"] * 3          # Strongly influence rainfall
-df["river_discharge_weighted"] = df["river_discharge"] * 2
-df["precip_3d_sum_weighted"] = df["precip_3d_sum"] * 2
-df["precip_7d_sum_weighted"] = df["precip_7d_sum"] * 2
+def fit_config(matrix_path, config_id, k, contamination, weighting, out_dir, seed=42):
+    """
+    Fits scaler + KMeans + IsolationForest for one grid point and saves the
+    artifacts under `out_dir/config_id`. Runs inside a worker process.
+    """
+    # One BLAS/OpenMP thread per process; the pool provides the parallelism
+    with threadpool_limits(limits=1):
+        X = np.load(matrix_path, mmap_mode="r")
+
+        t0 = time.perf_counter()
+        scaler = StandardScaler().fit(pd.DataFrame(X, columns=FEATURE_COLS))
+        apply_weights(scaler, weighting)
+        X_scaled = (X - scaler.mean_) / scaler.scale_
+        scale_time = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        kmeans = KMeans(n_clusters=k, init="k-means++", n_init="auto", random_state=seed)
+        labels = kmeans.fit_predict(X_scaled)
+        kmeans_time = time.perf_counter() - t0
 
-feature_cols = [
-    "precip_weighted", "river_discharge_weighted",
-    "precip_lag1", "precip_lag2",
-    "precip_3d_sum_weighted", "precip_7d_sum_weighted",
-    "month", "day_of_year", "weekday"
-]
+        t0 = time.perf_counter()
+        iso = IsolationForest(contamination=contamination, random_state=seed)
+        iso.fit(X_scaled)
+        iso_time = time.perf_counter() - t0
+
+        metrics = score_models(X_scaled, labels, kmeans, iso, seed)
+
+    return save_config(
+        Path(out_dir) / config_id, config_id, scaler, kmeans, iso, metrics,
+        params={"k": k, "contamination": contamination, "weighting": weighting, "seed": seed},
+        timings=(scale_time, kmeans_time, iso_time),
+        risk_order=cluster_order(np.asarray(X[:, 0]), labels, k),
+    )
+
+
+def score_models(X_scaled, labels, kmeans, iso, seed):
+    """Clustering and anomaly metrics on a fixed-size sample of `X_scaled`."""
+    # Scoring metrics are quadratic in n, so they use a fixed sample
+    rng = np.random.default_rng(seed)
+    idx = rng.choice(len(X_scaled), size=min(METRIC_SAMPLE, len(X_scaled)), replace=False)
+    sample, sample_labels = X_scaled[idx], labels[idx]
+    multi = len(np.unique(sample_labels)) > 1
+    return {
+        # Per row on the metric sample for every run: a streamed model's
+        # inertia_ only covers its last chunk, and sample sizes can differ
+        "inertia_per_row": float(-kmeans.score(sample) / len(sample)),
+        "silhouette": float(silhouette_score(sample, sample_labels)) if multi else None,
+        "davies_bouldin": float(davies_bouldin_score(sample, sample_labels)) if multi else None,
+        "calinski_harabasz": float(calinski_harabasz_score(sample, sample_labels)) if multi else None,
+        "anomaly_rate": float(np.mean(iso.predict(sample) == -1)),
+    }
+
+
+def cluster_order(precip, labels, k):
+    """Cluster ids sorted by mean rainfall, so they can be labelled Low -> High."""
+    cluster_means = {
+        c: float(precip[labels == c].mean()) if np.any(labels == c) else float("-inf")
+        for c in range(k)
+    }
+    return [int(c) for c in sorted(cluster_means, key=cluster_means.get)]
+
+
+def relabel_by_risk(kmeans, risk_order):
+    """Reorders the clusters in place so cluster id == risk rank (0 = lowest)."""
+    order = np.asarray(risk_order)
+    rank = np.argsort(order)  # old id -> new id
+    kmeans.cluster_centers_ = kmeans.cluster_centers_[order]
+    if getattr(kmeans, "labels_", None) is not None:
+        kmeans.labels_ = rank[kmeans.labels_]
+    if hasattr(kmeans, "_counts"):
+        kmeans._counts = kmeans._counts[order]
+
+
+def save_config(config_dir, config_id, scaler, kmeans, iso, metrics, params, timings, risk_order):
+    """Dumps one configuration's artifacts and returns its result record."""
+    config_dir.mkdir(parents=True, exist_ok=True)
+    relabel_by_risk(kmeans, risk_order)
+    joblib.dump(kmeans, config_dir / KMEANS_FILE)
+    joblib.dump(iso, config_dir / ISO_FILE)
+    joblib.dump(scaler, config_dir / SCALER_FILE)
+
+    scale_time, kmeans_time, iso_time = timings
+    return {
+        "config_id": config_id,
+        "params": params,
+        "fit_time_s": {
+            "scaler": round(scale_time, 4),
+            "kmeans": round(kmeans_time, 4),
+            "isolation_forest": round(iso_time, 4),
+            "total": round(scale_time + kmeans_time + iso_time, 4),
+        },
+        "metrics": metrics,
+        # Clusters are saved already ordered, so this is always 0..k-1
+        "cluster_order_by_precip": list(range(len(risk_order))),
+        "artifacts": str(config_dir),
+    }
 
-X = df[feature_cols]
 
 # ------------------------------
-# 4. Standardize
+# 1b. Out-of-core fit (streaming)
 # ------------------------------
-scaler = StandardScaler()
-X_scaled = scaler.fit_transform(X)
+def fit_streaming(config_id, k, contamination, weighting, out_dir,
+                  chunk_size=65_536, reservoir_size=200_000, seed=42):
+    """
+    Fits the same three artifacts without materializing the dataset.
+
+    Pass 1 streams chunks into `StandardScaler.partial_fit` and keeps a
+    uniform reservoir sample. Pass 2 streams scaled chunks into
+    `MiniBatchKMeans.partial_fit`, seeded with k-means++ on the reservoir.
+    The IsolationForest (which subsamples anyway) is fit on the reservoir.
+    Peak memory is one chunk plus the reservoir.
+    """
+    from parquet_store import iter_batches
+
+    rng = np.random.default_rng(seed)
+    reservoir = np.empty((reservoir_size, len(FEATURE_COLS)), dtype=np.float32)
+    seen = 0
+
+    # --- Pass 1: scaler statistics + reservoir sample ---
+    t0 = time.perf_counter()
+    scaler = StandardScaler()
+    for chunk in iter_batches(SOURCE_DATASET, columns=SOURCE_COLUMNS, batch_size=chunk_size):
+        F = build_features(chunk)
+        scaler.partial_fit(F)
+        rows = F.to_numpy()
+
+        # Algorithm R, vectorized per chunk
+        fill = max(0, min(reservoir_size - seen, len(rows)))
+        reservoir[seen:seen + fill] = rows[:fill]
+        if fill < len(rows):
+            positions = np.arange(seen + fill, seen + len(rows))
+            slots = rng.integers(0, positions + 1)
+            keep = slots < reservoir_size
+            reservoir[slots[keep]] = rows[fill:][keep]
+        seen += len(rows)
+
+    if seen == 0:
+        raise RuntimeError(f"Dataset '{SOURCE_DATASET}' is empty.")
+    reservoir = reservoir[:min(seen, reservoir_size)]
+    apply_weights(scaler, weighting)
+    sample_scaled = (reservoir - scaler.mean_) / scaler.scale_
+    scale_time = time.perf_counter() - t0
+
+    # --- Pass 2: mini-batch KMeans ---
+    t0 = time.perf_counter()
+    init_centers, _ = kmeans_plusplus(sample_scaled, n_clusters=k, random_state=seed)
+    # compute_labels=False: per-chunk labels/inertia would be discarded anyway
+    kmeans = MiniBatchKMeans(n_clusters=k, init=init_centers, n_init=1, random_state=seed, compute_labels=False)
+    pending = None
+    # Shuffled file order: mini-batch updates drift toward whatever they saw last
+    for chunk in iter_batches(SOURCE_DATASET, columns=SOURCE_COLUMNS, batch_size=chunk_size, seed=seed):
+        X_chunk = (build_features(chunk).to_numpy() - scaler.mean_) / scaler.scale_
+        # Only the first partial_fit needs >= k rows; carry short chunks into it
+        if not hasattr(kmeans, "cluster_centers_"):
+            if pending is not None:
+                X_chunk = np.vstack([pending, X_chunk])
+            if len(X_chunk) < k:
+                pending = X_chunk
+                continue
+            pending = None
+        kmeans.partial_fit(X_chunk)
+    kmeans_time = time.perf_counter() - t0
+
+    # --- IsolationForest on the reservoir ---
+    t0 = time.perf_counter()
+    iso = IsolationForest(contamination=contamination, random_state=seed)
+    iso.fit(sample_scaled)
+    iso_time = time.perf_counter() - t0
+
+    labels = kmeans.predict(sample_scaled)
+    metrics = score_models(sample_scaled, labels, kmeans, iso, seed)
+    metrics["rows_seen"] = int(seen)
+    metrics["reservoir_rows"] = int(len(reservoir))
+
+    return save_config(
+        Path(out_dir) / config_id, config_id, scaler, kmeans, iso, metrics,
+        params={
+            "k": k, "contamination": contamination, "weighting": weighting, "seed": seed,
+            "streaming": True, "chunk_size": chunk_size, "reservoir_size": reservoir_size,
+        },
+        timings=(scale_time, kmeans_time, iso_time),
+        risk_order=cluster_order(reservoir[:, 0], labels, k),
+    )
+
 
 # ------------------------------
-# 5. KMeans with smarter initialization
+# 2. Selection
 # ------------------------------
-# We'll use "k-means++" init for better centroid separation
-kmeans = KMeans(n_clusters=3, init="k-means++", random_state=42)
-df["flood_risk_cluster"] = kmeans.fit_predict(X_scaled)
+# metric -> True if higher is better
+SELECTION_METRICS = {"silhouette": True, "calinski_harabasz": True, "davies_bouldin": False}
+
+
+def pick_best(results, metric):
+    """Best drop-in configuration: only k == len(RISK_LEVELS) maps onto the server's RISK_MAP."""
+    scored = [
+        r for r in results
+        if r["metrics"][metric] is not None and r["params"]["k"] == len(RISK_LEVELS)
+    ]
+    if not scored:
+        raise RuntimeError(
+            f"No k={len(RISK_LEVELS)} configuration produced a '{metric}' score; "
+            f"other k values are kept in results.json but can't be deployed as-is."
+        )
+    higher_is_better = SELECTION_METRICS[metric]
+    key = lambda r: r["metrics"][metric]
+    return max(scored, key=key) if higher_is_better else min(scored, key=key)
 
-# Assign readable labels by comparing cluster means
-cluster_means = df.groupby("flood_risk_cluster")[["precip", "river_discharge"]].mean().sort_values("precip")
-risk_labels = {cluster: label for cluster, label in zip(cluster_means.index, ["Low", "Medium", "High"])}
-df["risk_label"] = df["flood_risk_cluster"].map(risk_labels)
 
-# Save model + scaler
-joblib.dump(kmeans, "models/flood_kmeans.pkl")
-joblib.dump(scaler, "models/flood_scaler.pkl")
+def write_bundle(best, results, run_dir, args, matrix_path):
+    """Copies the best artifacts to `run_dir/best` and writes the manifest."""
+    best_dir = run_dir / "best"
+    best_dir.mkdir(exist_ok=True)
+    for name in (KMEANS_FILE, ISO_FILE, SCALER_FILE):
+        shutil.copy2(Path(best["artifacts"]) / name, best_dir / name)
 
-print("✅ KMeans clustering complete with clearer separation.")
+    manifest = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "dataset": SOURCE_DATASET,
+        "dataset_fingerprint": dataset_fingerprint(),
+        "feature_matrix": str(matrix_path) if matrix_path else None,
+        "feature_cols": FEATURE_COLS,
+        "weights": WEIGHTINGS[best["params"]["weighting"]],
+        "sklearn_version": sklearn.__version__,
+        "selection_metric": args.select,
+        "n_jobs": args.n_jobs,
+        "best": best,
+        "risk_labels": dict(zip([str(c) for c in best["cluster_order_by_precip"]], RISK_LEVELS)),
+        "artifacts": {"kmeans": KMEANS_FILE, "isolation_forest": ISO_FILE, "scaler": SCALER_FILE},
+        "results": results,
+    }
+    with open(best_dir / "manifest.json", "w") as f:
+        json.dump(manifest, f, indent=2)
+    with open(run_dir / "results.json", "w") as f:
+        json.dump(results, f, indent=2)
+    return best_dir
 
-# Visualize
-plt.figure(figsize=(6,4))
-sns.countplot(x="risk_label", data=df, palette="viridis", order=["Low", "Medium", "High"])
-plt.title("Flood Risk Clusters (KMeans)")
-plt.xlabel("Risk Level")
-plt.ylabel("Count")
-plt.show()
 
 # ------------------------------
-# 6. Isolation Forest (Anomalies)
+# 3. Optional outputs
 # ------------------------------
-iso = IsolationForest(contamination=0.05, random_state=42)
-df["anomaly"] = iso.fit_predict(X_scaled)
-df["anomaly_score"] = iso.decision_function(X_scaled)
+def save_plots(best_dir):
+    """Renders the old interactive plots to PNG files (no display needed)."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    df, _ = label_dataset(best_dir)
+
+    plt.figure(figsize=(6, 4))
+    df["risk_label"].value_counts().reindex(["Low", "Medium", "High"]).plot(kind="bar")
+    plt.title("Flood Risk Clusters (KMeans)")
+    plt.xlabel("Risk Level")
+    plt.ylabel("Count")
+    plt.tight_layout()
+    plt.savefig(best_dir / "risk_clusters.png")
+    plt.close()
+
+    plt.figure(figsize=(12, 5))
+    plt.plot(df["time"], df["precip"], label="Rainfall (mm)", color="blue")
+    anomalies = df[df["anomaly"] == -1]
+    plt.scatter(anomalies["time"], anomalies["precip"],
+                color="red", label="Anomaly (Potential Flood)", marker="x")
+    plt.title("Rainfall with Anomaly Detection")
+    plt.xlabel("Time")
+    plt.ylabel("Rainfall (mm)")
+    plt.legend()
+    plt.tight_layout()
+    plt.savefig(best_dir / "anomalies.png")
+    plt.close()
+    print(f"✅ Plots saved to {best_dir}")
 
-joblib.dump(iso, "models/flood_isolationforest.pkl")
 
-print("✅ IsolationForest anomaly detection complete.")
+def label_dataset(best_dir):
+    """Scores the full dataset with a bundle, returning (df, manifest)."""
+    from parquet_store import load_dataset
+
+    with open(best_dir / "manifest.json") as f:
+        manifest = json.load(f)
+    kmeans = joblib.load(best_dir / KMEANS_FILE)
+    iso = joblib.load(best_dir / ISO_FILE)
+    scaler = joblib.load(best_dir / SCALER_FILE)
+
+    df = load_dataset(SOURCE_DATASET, columns=SOURCE_COLUMNS + ["barangay"])
+    # float64 like the fit (and the server); KMeans won't predict float32
+    # input with float64 centers
+    X_scaled = scaler.transform(build_features(df).astype(np.float64))
+    df["flood_risk_cluster"] = kmeans.predict(X_scaled)
+    df["risk_label"] = df["flood_risk_cluster"].astype(str).map(manifest["risk_labels"])
+    df["anomaly"] = iso.predict(X_scaled)
+    df["anomaly_score"] = iso.decision_function(X_scaled)
+    return df, manifest
 
-# Visualize anomalies
-plt.figure(figsize=(12,5))
-plt.plot(df["time"], df["precip"], label="Rainfall (mm)", color="blue")
-plt.scatter(df[df["anomaly"]==-1]["time"], df[df["anomaly"]==-1]["precip"],
-            color="red", label="Anomaly (Potential Flood)", marker="x")
-plt.title("Rainfall with Anomaly Detection")
-plt.xlabel("Time")
-plt.ylabel("Rainfall (mm)")
-plt.legend()
-plt.show()
 
 # ------------------------------
-# 7. Save enhanced dataset
+# 4. CLI
 # ------------------------------
-df.to_csv("../dataset/csv/angeles_barangay_risk.csv", index=False)
-print("✅ Enhanced dataset saved with risk_label + anomaly columns")
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Headless KMeans/IsolationForest training with a parallel hyperparameter sweep."
+    )
+    parser.add_argument("--k", type=int, nargs="+", default=[3], help="KMeans cluster counts to try.")
+    parser.add_argument("--contamination", type=float, nargs="+", default=[0.05],
+                        help="IsolationForest contamination values to try.")
+    parser.add_argument("--weightings", nargs="+", default=["default"], choices=sorted(WEIGHTINGS),
+                        help="Feature weightings to try (see features.WEIGHTINGS).")
+    parser.add_argument("--n-jobs", type=int, default=-1, help="Worker processes (-1 = all cores).")
+    parser.add_argument("--select", default="silhouette", choices=sorted(SELECTION_METRICS),
+                        help="Metric used to pick the best configuration.")
+    parser.add_argument("--out", type=Path, default=None, help="Run directory (default: runs/<timestamp>).")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--refresh-features", action="store_true", help="Rebuild the cached feature matrix.")
+    parser.add_argument("--plot", action="store_true", help="Save diagnostic plots as PNG files.")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Out-of-core fit: stream the dataset in chunks (MiniBatchKMeans, reservoir-sampled IsolationForest).")
+    parser.add_argument("--chunk-size", type=int, default=65_536, help="Rows per streamed chunk.")
+    parser.add_argument("--reservoir-size", type=int, default=200_000,
+                        help="Reservoir sample size used for the IsolationForest and metrics.")
+    parser.add_argument("--save-dataset", action="store_true",
+                        help="Write the dataset labelled by the best bundle to the 'barangay_risk' dataset.")
+    args = parser.parse_args(argv)
+    if args.n_jobs < 1:
+        args.n_jobs = os.cpu_count() or 1
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    run_dir = args.out or RUNS_DIR / datetime.now().strftime("%Y%m%d-%H%M%S")
+    configs_dir = run_dir / "configs"
+    configs_dir.mkdir(parents=True, exist_ok=True)
+
+    grid = list(itertools.product(args.k, args.contamination, args.weightings))
+
+    if args.streaming:
+        # Nothing is materialized or cached; each config streams the dataset
+        matrix_path = None
+        submit = lambda pool, k, c, w: pool.submit(
+            fit_streaming, f"k{k}-c{c}-{w}-stream", k, c, w, configs_dir,
+            args.chunk_size, args.reservoir_size, args.seed,
+        )
+    else:
+        # Feature build happens once; workers memory-map the cached matrix
+        matrix_path = cached_feature_matrix(refresh=args.refresh_features)
+        submit = lambda pool, k, c, w: pool.submit(
+            fit_config, matrix_path, f"k{k}-c{c}-{w}", k, c, w, configs_dir, args.seed
+        )
+
+    print(f"--- [INFO] Sweeping {len(grid)} configurations on {args.n_jobs} processes ---")
+
+    results = []
+    with ProcessPoolExecutor(max_workers=min(args.n_jobs, len(grid))) as pool:
+        futures = {submit(pool, k, c, w): (k, c, w) for k, c, w in grid}
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            m = result["metrics"]
+            print(f"✅ {result['config_id']}: silhouette={m['silhouette']} "
+                  f"anomaly_rate={m['anomaly_rate']:.3f} fit={result['fit_time_s']['total']}s")
+
+    results.sort(key=lambda r: r["config_id"])
+    best = pick_best(results, args.select)
+    best_dir = write_bundle(best, results, run_dir, args, matrix_path)
+    print(f"🎯 Best configuration: {best['config_id']} ({args.select}={best['metrics'][args.select]})")
+    print(f"✅ Bundle written to {best_dir}")
+
+    if args.plot:
+        save_plots(best_dir)
+    if args.save_dataset:
+        from parquet_store import write_dataset
+        df, _ = label_dataset(best_dir)
+        write_dataset(df, "barangay_risk")
+        print("✅ Enhanced dataset saved with risk_label + anomaly columns")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+import argparse
+import json
+import sys
+import joblib
+import numpy as np
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+SERVER_MODELS = ROOT / "server" / "models"
+
+# The NumPy runtime lives with the server; it only needs numpy to import
+sys.path.append(str(ROOT / "server" / "app"))
+import compiled
+
+# name -> (pickle path, exporter kind)
+DEFAULT_MODELS = {
+    "scaler": (SERVER_MODELS / "flood_scaler.pkl", "scaler"),
+    "kmeans": (SERVER_MODELS / "flood_kmeans.pkl", "kmeans"),
+    "isolation_forest": (SERVER_MODELS / "flood_isolationforest.pkl", "isolation_forest"),
+    "random_forest": (ROOT / "ai_training" / "flood_rf_model.pkl", "forest_classifier"),
+    "xgboost": (ROOT / "ai_training" / "flood_xgb_model.pkl", "xgb_classifier"),
+    "mlp": (ROOT / "ai_training" / "flood_mlp_model.pkl", "mlp_classifier"),
+}
+
+
+# ------------------------------
+# 1. Tree flattening helpers
+# ------------------------------
+def _average_path_length(n):
+    """c(n): expected path length of an unsuccessful BST search (IsolationForest)."""
+    n = np.asarray(n, dtype=np.float64)
+    out = np.zeros_like(n)
+    out[n == 2] = 1.0
+    big = n > 2
+    out[big] = 2.0 * (np.log(n[big] - 1.0) + np.euler_gamma) - 2.0 * (n[big] - 1.0) / n[big]
+    return out
+
+
+def _node_depths(tree):
+    depth = np.zeros(tree.node_count, dtype=np.int64)
+    for node in range(tree.node_count):
+        for child in (tree.children_left[node], tree.children_right[node]):
+            if child != -1:
+                depth[child] = depth[node] + 1
+    return depth
+
+
+def _flatten_sklearn_trees(trees, feature_maps=None):
+    """
+    Concatenates sklearn trees into one node table with global child indices.
+    Leaves have feature == -1. Returns (arrays, per-tree node offsets).
+    """
+    feature, threshold, left, right, roots, offsets = [], [], [], [], [], []
+    offset, max_depth = 0, 0
+    for i, est in enumerate(trees):
+        t = est.tree_
+        is_leaf = t.children_left == -1
+        f = t.feature.astype(np.int64)
+        if feature_maps is not None:
+            f = np.where(is_leaf, -1, np.asarray(feature_maps[i])[np.where(is_leaf, 0, f)])
+        feature.append(np.where(is_leaf, -1, f))
+        threshold.append(t.threshold.astype(np.float64))
+        left.append(np.where(is_leaf, -1, t.children_left + offset))
+        right.append(np.where(is_leaf, -1, t.children_right + offset))
+        roots.append(offset)
+        offsets.append(offset)
+        max_depth = max(max_depth, t.max_depth)
+        offset += t.node_count
+    arrays = {
+        "feature": np.concatenate(feature),
+        "threshold": np.concatenate(threshold),
+        "left": np.concatenate(left),
+        "right": np.concatenate(right),
+        "roots": np.array(roots, dtype=np.int64),
+        "max_depth": np.array(max_depth),
+    }
+    return arrays, offsets
+
+
+def _feature_names(model):
+    names = getattr(model, "feature_names_in_", None)
+    if names is None and hasattr(model, "get_booster"):
+        names = model.get_booster().feature_names
+    return np.array([] if names is None else list(names), dtype=str)
+
+
+# ------------------------------
+# 2. Exporters (pickle -> flat arrays)
+# ------------------------------
+EXPORTERS = {}
+
+def _exporter(kind):
+    def wrap(fn):
+        EXPORTERS[kind] = fn
+        return fn
+    return wrap
+
+
+@_exporter("scaler")
+def export_scaler(model):
+    return {"mean": model.mean_, "scale": model.scale_, "feature_names": _feature_names(model)}
+
+
+@_exporter("kmeans")
+def export_kmeans(model):
+    return {"centers": model.cluster_centers_.astype(np.float64)}
+
+
+@_exporter("isolation_forest")
+def export_isolation_forest(model):
+    n_features = model.n_features_in_
+    # Trees only see a column subset when max_features < n_features
+    subsampled = any(len(f) != n_features for f in model.estimators_features_)
+    arrays, offsets = _flatten_sklearn_trees(
+        model.estimators_, model.estimators_features_ if subsampled else None
+    )
+    # Per-leaf contribution: depth + c(n_samples in leaf)
+    leaf_value = []
+    for est in model.estimators_:
+        t = est.tree_
+        leaf_value.append(_node_depths(t) + _average_path_length(t.n_node_samples))
+    arrays["leaf_value"] = np.concatenate(leaf_value)
+    arrays["denominator"] = np.array(
+        len(model.estimators_) * _average_path_length([model.max_samples_])[0]
+    )
+    arrays["offset"] = np.array(model.offset_)
+    return arrays
+
+
+@_exporter("forest_classifier")
+def export_forest_classifier(model):
+    arrays, _ = _flatten_sklearn_trees(model.estimators_)
+    # Normalize per-node class weights into probabilities
+    values = []
+    for est in model.estimators_:
+        v = est.tree_.value[:, 0, :]
+        values.append(v / v.sum(axis=1, keepdims=True))
+    arrays["value"] = np.concatenate(values)
+    arrays["classes"] = np.asarray(model.classes_)
+    arrays["feature_names"] = _feature_names(model)
+    return arrays
+
+
+@_exporter("xgb_classifier")
+def export_xgb_classifier(model):
+    booster = model.get_booster()
+    config = json.loads(booster.save_config())["learner"]
+    objective = config["objective"]["name"]
+    n_classes = int(config["learner_model_param"].get("num_class", 0) or 0)
+    n_groups = n_classes if n_classes > 2 else 1
+    base_score = np.array(
+        [float(v) for v in config["learner_model_param"]["base_score"].strip("[]").split(",")]
+    )
+    if objective == "binary:logistic":
+        base_margin = np.log(base_score / (1.0 - base_score))
+    elif objective in ("multi:softprob", "multi:softmax"):
+        base_margin = base_score
+    else:
+        raise ValueError(f"Unsupported XGBoost objective '{objective}'")
+
+    names = booster.feature_names
+    feature, threshold, left, right, missing, leaf_value = [], [], [], [], [], []
+    roots, tree_class, max_depth = [], [], 0
+
+    for tree_idx, dump in enumerate(booster.get_dump(dump_format="json")):
+        nodes = {}
+        stack = [(json.loads(dump), 0)]
+        while stack:
+            node, depth = stack.pop()
+            nodes[node["nodeid"]] = node
+            max_depth = max(max_depth, depth)
+            stack.extend((child, depth + 1) for child in node.get("children", []))
+
+        offset = len(feature)
+        ids = sorted(nodes)
+        local = {nid: offset + i for i, nid in enumerate(ids)}
+        for nid in ids:
+            node = nodes[nid]
+            if "leaf" in node:
+                feature.append(-1)
+                threshold.append(0.0)
+                left.append(-1)
+                right.append(-1)
+                missing.append(-1)
+                leaf_value.append(node["leaf"])
+            else:
+                split = node["split"]
+                feature.append(names.index(split) if names else int(split.lstrip("f")))
+                threshold.append(node["split_condition"])
+                left.append(local[node["yes"]])
+                right.append(local[node["no"]])
+                missing.append(local[node["missing"]])
+                leaf_value.append(0.0)
+        roots.append(local[0])
+        tree_class.append(tree_idx % n_groups)
+
+    return {
+        "feature": np.array(feature, dtype=np.int64),
+        # XGBoost compares in float32
+        "threshold": np.array(threshold, dtype=np.float32),
+        "left": np.array(left, dtype=np.int64),
+        "right": np.array(right, dtype=np.int64),
+        "missing": np.array(missing, dtype=np.int64),
+        "leaf_value": np.array(leaf_value, dtype=np.float64),
+        "roots": np.array(roots, dtype=np.int64),
+        "tree_class": np.array(tree_class, dtype=np.int64),
+        "max_depth": np.array(max_depth),
+        "n_groups": np.array(n_groups),
+        "base_margin": base_margin[:n_groups] if len(base_margin) >= n_groups else np.repeat(base_margin, n_groups),
+        "classes": np.asarray(getattr(model, "classes_", np.arange(max(n_classes, 2)))),
+        "feature_names": _feature_names(model),
+    }
+
+
+@_exporter("mlp_classifier")
+def export_mlp_classifier(model):
+    arrays = {
+        "n_layers": np.array(len(model.coefs_)),
+        "activation": np.array(model.activation),
+        "out_activation": np.array(model.out_activation_),
+        "classes": np.asarray(model.classes_),
+        "feature_names": _feature_names(model),
+    }
+    for i, (W, b) in enumerate(zip(model.coefs_, model.intercepts_)):
+        arrays[f"coef_{i}"] = W
+        arrays[f"intercept_{i}"] = b
+    return arrays
+
+
+def export(name, pickle_path, kind, out_dir):
+    model = joblib.load(pickle_path)
+    arrays = EXPORTERS[kind](model)
+    out_path = out_dir / f"{name}.npz"
+    np.savez_compressed(out_path, kind=np.array(kind), **arrays)
+    print(f"✅ {name}: {pickle_path.name} ({pickle_path.stat().st_size // 1024} KB) "
+          f"-> {out_path.name} ({out_path.stat().st_size // 1024} KB)")
+    return model, out_path
+
+
+# ------------------------------
+# 3. Parity check (pickle vs compiled)
+# ------------------------------
+def sample_inputs(model, n, seed):
+    """Random rows in a plausible range for the model's feature count."""
+    rng = np.random.default_rng(seed)
+    n_features = getattr(model, "n_features_in_", None) or model.cluster_centers_.shape[1]
+    # Mix of standardized-looking values and non-negative raw-looking values
+    X = np.vstack([
+        rng.normal(0, 2, size=(n // 2, n_features)),
+        rng.gamma(1.0, 20.0, size=(n - n // 2, n_features)),
+    ])
+    names = _feature_names(model)
+    if names.size:
+        import pandas as pd
+        return pd.DataFrame(X, columns=names)
+    return X
+
+
+def verify(name, kind, model, out_path, n=2000, seed=0):
+    """Compares the compiled model to the pickle on random inputs."""
+    runtime = compiled.load(out_path)
+    X = sample_inputs(model, n, seed)
+    X_plain = np.asarray(X)
+    checks = []
+
+    if kind == "scaler":
+        checks.append(("transform", np.allclose(runtime.transform(X), model.transform(X))))
+    elif kind == "kmeans":
+        checks.append(("predict", np.array_equal(runtime.predict(X_plain), model.predict(X_plain))))
+    elif kind == "isolation_forest":
+        checks.append(("score_samples", np.allclose(runtime.score_samples(X_plain), model.score_samples(X_plain))))
+        checks.append(("predict", np.array_equal(runtime.predict(X_plain), model.predict(X_plain))))
+    else:
+        expected = model.predict_proba(X)
+        checks.append(("predict_proba", np.allclose(runtime.predict_proba(X), expected, atol=1e-5)))
+
+    ok = all(passed for _, passed in checks)
+    status = "✅" if ok else "❌"
+    print(f"{status} parity {name}: " + ", ".join(f"{c}={'ok' if p else 'MISMATCH'}" for c, p in checks))
+    return ok
+
+
+# ------------------------------
+# 4. CLI
+# ------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Export pickled models to NumPy .npz files for the sklearn-free server runtime."
+    )
+    parser.add_argument("--models", nargs="+", default=list(DEFAULT_MODELS), choices=list(DEFAULT_MODELS))
+    parser.add_argument("--bundle", type=Path, default=None,
+                        help="Take scaler/kmeans/isolation_forest from a training bundle directory instead.")
+    parser.add_argument("--out", type=Path, default=SERVER_MODELS / "compiled")
+    parser.add_argument("--verify", action="store_true", help="Check parity against the pickles after exporting.")
+    args = parser.parse_args(argv)
+
+    models = dict(DEFAULT_MODELS)
+    if args.bundle:
+        for name, (path, kind) in DEFAULT_MODELS.items():
+            if path.parent == SERVER_MODELS:
+                models[name] = (args.bundle / path.name, kind)
+
+    args.out.mkdir(parents=True, exist_ok=True)
+    failed = []
+    for name in args.models:
+        path, kind = models[name]
+        if not path.exists():
+            print(f"⚠️ Skipping {name}: {path} not found")
+            continue
+        model, out_path = export(name, path, kind, args.out)
+        if args.verify and not verify(name, kind, model, out_path):
+            failed.append(name)
+
+    if failed:
+        print(f"❌ Parity check failed for: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
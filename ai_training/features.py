@@ -0,0 +1,118 @@
+import hashlib
+import json
+import sys
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "dataset"))
+from parquet_store import dataset_path, load_dataset
+
+# ------------------------------
+# Feature definitions shared by training and export
+# ------------------------------
+SOURCE_DATASET = "rainfall_discharge"
+
+SOURCE_COLUMNS = [
+    "time", "precip", "river_discharge",
+    "precip_lag1", "precip_lag2", "precip_3d_sum", "precip_7d_sum",
+]
+
+# Column names the server's scaler expects (see server/app/predictor.py)
+FEATURE_COLS = [
+    "precip_weighted", "river_discharge_weighted",
+    "precip_lag1", "precip_lag2",
+    "precip_3d_sum_weighted", "precip_7d_sum_weighted",
+    "month", "day_of_year", "weekday",
+]
+
+# Per-feature weights, keyed by FEATURE_COLS name. Anything missing is 1.0.
+WEIGHTINGS = {
+    "default": {
+        "precip_weighted": 3.0,
+        "river_discharge_weighted": 2.0,
+        "precip_3d_sum_weighted": 2.0,
+        "precip_7d_sum_weighted": 2.0,
+    },
+    "flat": {},
+    "rain_heavy": {
+        "precip_weighted": 4.0,
+        "river_discharge_weighted": 1.5,
+        "precip_3d_sum_weighted": 3.0,
+        "precip_7d_sum_weighted": 3.0,
+    },
+    "discharge_heavy": {
+        "precip_weighted": 2.0,
+        "river_discharge_weighted": 4.0,
+        "precip_3d_sum_weighted": 1.5,
+        "precip_7d_sum_weighted": 1.5,
+    },
+}
+
+CACHE_DIR = Path(__file__).resolve().parent / ".cache"
+
+
+def weight_vector(weighting: str) -> np.ndarray:
+    """Returns the weights of a named weighting in FEATURE_COLS order."""
+    weights = WEIGHTINGS[weighting]
+    return np.array([weights.get(col, 1.0) for col in FEATURE_COLS], dtype=np.float64)
+
+
+def apply_weights(scaler, weighting: str):
+    """
+    Folds a feature weighting into a fitted StandardScaler.
+
+    Multiplying a raw column by a constant is undone by standardization, so
+    weights are applied to the *scaled* features instead: dividing `scale_`
+    by the weight gives `(x - mean) / scale * w`. The server keeps calling
+    `scaler.transform` on raw values and gets the weighted space for free.
+    """
+    scaler.scale_ = scaler.scale_ / weight_vector(weighting)
+    return scaler
+
+
+def build_features(df: pd.DataFrame) -> pd.DataFrame:
+    """Turns raw dataset rows into the model's feature frame (unweighted)."""
+    time = pd.to_datetime(df["time"])
+    out = pd.DataFrame({
+        "precip_weighted": df["precip"],
+        "river_discharge_weighted": df["river_discharge"],
+        "precip_lag1": df["precip_lag1"],
+        "precip_lag2": df["precip_lag2"],
+        "precip_3d_sum_weighted": df["precip_3d_sum"],
+        "precip_7d_sum_weighted": df["precip_7d_sum"],
+        "month": time.dt.month,
+        "day_of_year": time.dt.dayofyear,
+        "weekday": time.dt.weekday,
+    })
+    return out.fillna(0).astype(np.float32)
+
+
+def dataset_fingerprint(name: str = SOURCE_DATASET) -> str:
+    """Hashes the dataset's file listing (path, size, mtime) and the feature spec."""
+    h = hashlib.sha1()
+    h.update(json.dumps(FEATURE_COLS).encode())
+    for f in sorted(dataset_path(name).rglob("*.parquet")):
+        stat = f.stat()
+        h.update(f"{f.relative_to(dataset_path(name))}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return h.hexdigest()[:16]
+
+
+def cached_feature_matrix(name: str = SOURCE_DATASET, refresh: bool = False) -> Path:
+    """
+    Builds the feature matrix once and caches it as a .npy file.
+
+    Returns the cache path so worker processes can memory-map it instead of
+    each re-reading and re-featurizing the dataset.
+    """
+    CACHE_DIR.mkdir(exist_ok=True)
+    path = CACHE_DIR / f"features-{dataset_fingerprint(name)}.npy"
+    if path.exists() and not refresh:
+        print(f"✅ Using cached feature matrix {path.name}")
+        return path
+
+    df = load_dataset(name, columns=SOURCE_COLUMNS)
+    X = build_features(df).to_numpy()
+    np.save(path, X)
+    print(f"✅ Built feature matrix {X.shape} -> {path.name}")
+    return path
@@ -0,0 +1,64 @@
+"""
+End-to-end check of the training CLI on a small synthetic dataset: fit,
+bundle, then label the dataset with the bundle (`--save-dataset`).
+Run with `python -m pytest ai_training`.
+"""
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+pytest.importorskip("sklearn")
+pytest.importorskip("pyarrow")
+pytest.importorskip("threadpoolctl")
+
+import joblib
+
+import ai_training
+import features
+import parquet_store
+
+
+def _synthetic(n=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    time = pd.Timestamp("2020-01-01") + pd.to_timedelta(rng.integers(0, 1500, n), unit="D")
+    precip = rng.gamma(0.6, 12.0, n)
+    return pd.DataFrame({
+        "time": time,
+        "barangay": rng.choice(["Amsic", "Anunas", "Balibago"], n),
+        "precip": precip,
+        "river_discharge": rng.gamma(2.0, 3.0, n),
+        "precip_lag1": rng.gamma(0.6, 12.0, n),
+        "precip_lag2": rng.gamma(0.6, 12.0, n),
+        "precip_3d_sum": precip * 3,
+        "precip_7d_sum": precip * 7,
+    })
+
+
+@pytest.fixture
+def dataset(tmp_path, monkeypatch):
+    # Worker processes are forked, so they see the patched locations too
+    monkeypatch.setattr(parquet_store, "PARQUET_DIR", tmp_path / "parquet")
+    monkeypatch.setattr(features, "CACHE_DIR", tmp_path / "cache")
+    parquet_store.write_dataset(_synthetic(), features.SOURCE_DATASET)
+    return tmp_path
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_bundle_labels_dataset(dataset, streaming):
+    run_dir = dataset / "run"
+    argv = ["--k", "2", "3", "--n-jobs", "1", "--out", str(run_dir), "--save-dataset"]
+    if streaming:
+        argv += ["--streaming", "--chunk-size", "500", "--reservoir-size", "1000"]
+    ai_training.main(argv)
+
+    best_dir = run_dir / "best"
+    kmeans = joblib.load(best_dir / ai_training.KMEANS_FILE)
+    assert kmeans.n_clusters == len(ai_training.RISK_LEVELS)
+
+    labelled = parquet_store.load_dataset("barangay_risk")
+    assert len(labelled) == 3000
+    assert set(labelled["risk_label"].astype(str)) <= set(ai_training.RISK_LEVELS)
+
+    # Cluster ids are ordered by risk: mean rainfall rises with the id
+    means = labelled.groupby("flood_risk_cluster", observed=True)["precip"].mean()
+    assert means.is_monotonic_increasing
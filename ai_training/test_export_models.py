@@ -0,0 +1,99 @@
+"""
+Parity tests for export_models.py: every exported .npz must reproduce the
+pickle it came from. Run with `python -m pytest ai_training`.
+
+The shipped pickles are tested when present (and when their library
+imports); small models fitted here cover each exporter regardless.
+"""
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("sklearn")
+pytest.importorskip("pandas")
+
+import joblib
+import pandas as pd
+from sklearn.cluster import KMeans
+from sklearn.ensemble import IsolationForest, RandomForestClassifier
+from sklearn.neural_network import MLPClassifier
+from sklearn.preprocessing import StandardScaler
+
+import export_models
+
+NAMES = [f"f{i}" for i in range(6)]
+
+
+def _data(seed=0, n=400):
+    rng = np.random.default_rng(seed)
+    X = rng.gamma(1.0, 10.0, size=(n, len(NAMES)))
+    y = (X[:, 0] + X[:, 3] > 20).astype(int)
+    return pd.DataFrame(X, columns=NAMES), y
+
+
+FITTED = {
+    "scaler": (lambda X, y: StandardScaler().fit(X), "scaler"),
+    # Fitted on a plain array: no feature_names_in_
+    "scaler_unnamed": (lambda X, y: StandardScaler().fit(X.to_numpy()), "scaler"),
+    "kmeans": (lambda X, y: KMeans(3, n_init=3, random_state=0).fit(X.to_numpy()), "kmeans"),
+    "isolation_forest": (
+        lambda X, y: IsolationForest(n_estimators=50, random_state=0).fit(X.to_numpy()), "isolation_forest"
+    ),
+    "isolation_forest_subsampled": (
+        lambda X, y: IsolationForest(n_estimators=30, max_features=0.5, random_state=0).fit(X.to_numpy()),
+        "isolation_forest",
+    ),
+    "random_forest": (
+        lambda X, y: RandomForestClassifier(n_estimators=20, max_depth=6, random_state=0).fit(X, y),
+        "forest_classifier",
+    ),
+    "mlp": (
+        lambda X, y: MLPClassifier(hidden_layer_sizes=(8,), max_iter=300, random_state=0).fit(X, y),
+        "mlp_classifier",
+    ),
+}
+
+
+def _export_fitted(name, tmp_path):
+    fit, kind = FITTED[name]
+    pickle_path = tmp_path / f"{name}.pkl"
+    joblib.dump(fit(*_data()), pickle_path)
+    model, out_path = export_models.export(name, pickle_path, kind, tmp_path)
+    return model, kind, out_path
+
+
+@pytest.mark.filterwarnings("ignore::sklearn.exceptions.ConvergenceWarning")
+@pytest.mark.parametrize("name", list(FITTED))
+def test_fitted_model_parity(name, tmp_path):
+    model, kind, out_path = _export_fitted(name, tmp_path)
+    assert export_models.verify(name, kind, model, out_path)
+
+
+def test_unnamed_scaler_accepts_dataframe(tmp_path):
+    # The server always passes a DataFrame, even to scalers fitted without names
+    model, _, out_path = _export_fitted("scaler_unnamed", tmp_path)
+    X, _ = _data(seed=1, n=50)
+    runtime = export_models.compiled.load(out_path)
+    assert np.allclose(runtime.transform(X), model.transform(X.to_numpy()))
+
+
+def test_xgboost_parity(tmp_path):
+    xgb = pytest.importorskip("xgboost")
+    X, y = _data()
+    model = xgb.XGBClassifier(n_estimators=20, max_depth=4).fit(X, y)
+    pickle_path = tmp_path / "xgboost.pkl"
+    joblib.dump(model, pickle_path)
+
+    model, out_path = export_models.export("xgboost", pickle_path, "xgb_classifier", tmp_path)
+    assert export_models.verify("xgboost", "xgb_classifier", model, out_path)
+
+
+@pytest.mark.parametrize("name", list(export_models.DEFAULT_MODELS))
+def test_shipped_model_parity(name, tmp_path):
+    pickle_path, kind = export_models.DEFAULT_MODELS[name]
+    if not pickle_path.exists():
+        pytest.skip(f"{pickle_path.name} not present")
+    if kind == "xgb_classifier":
+        pytest.importorskip("xgboost")
+
+    model, out_path = export_models.export(name, pickle_path, kind, tmp_path)
+    assert export_models.verify(name, kind, model, out_path)
@@ -2,6 +2,7 @@ import openmeteo_requests
 import pandas as pd
 import requests_cache
 from retry_requests import retry
+from parquet_store import write_dataset
 
 # Setup Open-Meteo API client with cache + retry
 cache_session = requests_cache.CachedSession('.cache', expire_after=3600)
@@ -54,6 +55,5 @@ for idx, row in df.iterrows():
 # Combine all locations into one DataFrame
 final_df = pd.concat(all_results, ignore_index=True)
 
-# Save results
-final_df.to_csv("flood_data_results.csv", index=False)
-print("✅ Flood data saved to flood_data_results.csv")
+# Save results (Parquet, partitioned by year)
+write_dataset(final_df, "flood_discharge", time_col="date")
@@ -1,8 +1,9 @@
 import pandas as pd
+from parquet_store import load_dataset
 
 # Load datasets
 features_df = pd.read_csv("./csv/angeles_barangay_features_proxy.csv")
-flood_df = pd.read_csv("./csv/flood_data_results.csv")
+flood_df = load_dataset("flood_discharge", columns=["date", "river_discharge"])
 
 # Convert time columns
 features_df["time"] = pd.to_datetime(features_df["time"])
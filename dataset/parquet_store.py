@@ -0,0 +1,125 @@
+import random
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pathlib import Path
+
+# ------------------------------
+# Columnar dataset layer
+# ------------------------------
+# Every pipeline stage used to write a CSV that the next stage re-parsed
+# (dates included). These helpers write Parquet partitioned by year (and
+# barangay when present) with float32 features and a dictionary-encoded
+# barangay, so readers can project columns and push filters down to files.
+
+PARQUET_DIR = Path(__file__).resolve().parent / "parquet"
+
+FLOAT_COLUMNS = [
+    "precip", "river_discharge",
+    "precip_lag1", "precip_lag2",
+    "precip_3d_sum", "precip_7d_sum",
+    "latitude", "longitude", "elevation",
+    "anomaly_score",
+]
+
+SMALL_INT_COLUMNS = {
+    "month": "int8",
+    "weekday": "int8",
+    "day_of_year": "int16",
+    "flood_risk_cluster": "int8",
+    "anomaly": "int8",
+}
+
+
+def dataset_path(name: str) -> Path:
+    """Returns the directory a named dataset lives in."""
+    return PARQUET_DIR / name
+
+
+def _normalize(df: pd.DataFrame, time_col: str) -> pd.DataFrame:
+    """Casts columns to compact types and adds the `year` partition key."""
+    df = df.copy()
+    df[time_col] = pd.to_datetime(df[time_col])
+    if getattr(df[time_col].dt, "tz", None) is not None:
+        df[time_col] = df[time_col].dt.tz_localize(None)
+    df["year"] = df[time_col].dt.year.astype("int16")
+
+    for col in FLOAT_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype("float32")
+    for col, dtype in SMALL_INT_COLUMNS.items():
+        if col in df.columns and not df[col].isna().any():
+            df[col] = df[col].astype(dtype)
+    for col in ("barangay", "risk_label"):
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    return df
+
+
+def write_dataset(df: pd.DataFrame, name: str, time_col: str = "time") -> Path:
+    """
+    Writes `df` as a Parquet dataset partitioned by year (and barangay if
+    the frame has one). Existing partitions for the same dataset are replaced.
+    """
+    root = dataset_path(name)
+    df = _normalize(df, time_col)
+    partition_cols = ["year", "barangay"] if "barangay" in df.columns else ["year"]
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pq.write_to_dataset(
+        table,
+        root_path=str(root),
+        partition_cols=partition_cols,
+        existing_data_behavior="delete_matching",
+    )
+    print(f"✅ Wrote {len(df)} rows to Parquet dataset '{root}'")
+    return root
+
+
+def open_dataset(name: str) -> ds.Dataset:
+    """Opens a named dataset with hive partition discovery."""
+    return ds.dataset(str(dataset_path(name)), format="parquet", partitioning="hive")
+
+
+def load_dataset(name: str, columns=None, filters=None) -> pd.DataFrame:
+    """
+    Loads a dataset into pandas.
+
+    `columns` projects to a subset of columns and `filters` is a pyarrow
+    expression (e.g. `ds.field("year") >= 2023`). Both are pushed down, so
+    only the matching files and column chunks are read.
+    """
+    table = open_dataset(name).to_table(columns=columns, filter=filters)
+    df = table.to_pandas()
+    if "barangay" in df.columns:
+        df["barangay"] = df["barangay"].astype("category")
+    return df
+
+
+def iter_batches(name: str, columns=None, filters=None, batch_size: int = 65_536, seed=None):
+    """
+    Yields the dataset as pandas chunks of `batch_size` rows (the last one
+    may be shorter).
+
+    A scanner batch never spans files, and a file holds one barangay-year
+    (~365 rows), so batches are regrouped across files here. With `seed`,
+    files are read in a shuffled order instead of year/barangay order.
+    """
+    dataset = open_dataset(name)
+    fragments = list(dataset.get_fragments(filter=filters))
+    if seed is not None:
+        random.Random(seed).shuffle(fragments)
+
+    pending, rows = [], 0
+    for fragment in fragments:
+        for batch in fragment.to_batches(schema=dataset.schema, columns=columns, filter=filters, batch_size=batch_size):
+            pending.append(batch)
+            rows += batch.num_rows
+            while rows >= batch_size:
+                table = pa.Table.from_batches(pending)
+                yield table.slice(0, batch_size).to_pandas()
+                rest = table.slice(batch_size)
+                pending, rows = rest.to_batches(), rest.num_rows
+    if rows:
+        yield pa.Table.from_batches(pending).to_pandas()
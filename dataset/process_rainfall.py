@@ -1,16 +1,20 @@
+import sys
 import xarray as xr
 import rioxarray
 import geopandas as gpd
 import pandas as pd
 import matplotlib.pyplot as plt
 from pathlib import Path
+from parquet_store import load_dataset, write_dataset
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "server"))
+from feature_store import FeatureStore
 
 # ------------------------------
 # 1. File paths
 # ------------------------------
 chirps_folder = Path("chirps_data")
 shapefile_path = Path("ph_polygon/gadm41_PHL_3.shp")
-discharge_path = Path("csv/flood_data_results.csv")
 
 # ------------------------------
 # 2. Load CHIRPS NetCDF files
@@ -77,9 +81,13 @@ df_all["time"] = pd.to_datetime(df_all["time"]).dt.tz_localize(None)
 # ------------------------------
 # 7. Load river discharge data
 # ------------------------------
-discharge_df = pd.read_csv(discharge_path, parse_dates=["date"])
+# Timestamps are stored tz-naive already, so no re-parsing is needed
+discharge_df = load_dataset("flood_discharge", columns=["date", "river_discharge"])
 discharge_df = discharge_df.rename(columns={"date": "time"})
-discharge_df["time"] = pd.to_datetime(discharge_df["time"]).dt.tz_localize(None)
+
+# flood_discharge has one row per gauge location per day and no barangay
+# key, so average it to one value per day (one row per barangay-day below)
+discharge_df = discharge_df.groupby("time", as_index=False)["river_discharge"].mean()
 
 # ------------------------------
 # 8. Merge rainfall with discharge
@@ -90,13 +98,13 @@ merged = pd.merge(df_all, discharge_df[["time", "river_discharge"]],
 # ------------------------------
 # 9. Add rainfall lag/rolling features
 # ------------------------------
-merged = merged.sort_values(["barangay", "time"])
+merged = merged.sort_values(["barangay", "time"]).drop_duplicates(["barangay", "time"])
 
-# Group by barangay so lags are per-location
-merged["precip_lag1"] = merged.groupby("barangay")["precip"].shift(1)
-merged["precip_lag2"] = merged.groupby("barangay")["precip"].shift(2)
-merged["precip_3d_sum"] = merged.groupby("barangay")["precip"].rolling(3, min_periods=1).sum().reset_index(level=0, drop=True)
-merged["precip_7d_sum"] = merged.groupby("barangay")["precip"].rolling(7, min_periods=1).sum().reset_index(level=0, drop=True)
+# Same per-barangay ring buffers the API uses, so online/offline features match
+store = FeatureStore()
+rolling = store.replay(merged["barangay"], merged["time"], merged["precip"], merged["river_discharge"])
+for col, values in rolling.items():
+    merged[col] = values
 
 # Add temporal features
 merged["month"] = merged["time"].dt.month
@@ -106,8 +114,7 @@ merged["weekday"] = merged["time"].dt.weekday
 # ------------------------------
 # 10. Save merged dataset
 # ------------------------------
-merged.to_csv("angeles_barangay_rainfall_discharge.csv", index=False)
-print("✅ Saved merged dataset to 'angeles_barangay_rainfall_discharge.csv'")
+write_dataset(merged, "rainfall_discharge")
 
 # ------------------------------
 # 11. Quick plot (rainfall + discharge)
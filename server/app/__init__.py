@@ -1,37 +1,39 @@
 import os
-import joblib
-import pandas as pd
 import warnings
+from functools import partial
 from flask import Flask
 from flask_cors import CORS
 from dotenv import load_dotenv
+from feature_store import FeatureStore
+from profiling import CaptureWindow
+from .coalesce import Coalescer
+from .pipeline import PredictionPipeline
+from .predictor import ModelRegistry, load_model
+from .registry import BarangayRegistry
+from .serving import AdmissionController, StaleWhileRevalidate
 
 load_dotenv()
 
 # --- Suppress warnings ---
 warnings.filterwarnings("ignore", message="X has feature names")
 
-def create_app(config_class='config.Config'):
-    
-    app = Flask(__name__)
-    app.config.from_object(config_class) 
-
-    # --- CORS CONFIG ---
-    frontend_url = os.getenv("FRONTEND_URL", "http://localhost:5173")
-    print(f"--- [INFO] Configuring CORS for origin: {frontend_url} ---")
-    CORS(app, 
-         origins=[frontend_url],
-         supports_credentials=True
-    )
-
-    # --- LOAD MODELS *INSIDE* create_app ---
+def load_resources(app):
+    """
+    Loads models, the barangay list and the feature store into `app.config`.
+    Shared by the Flask app below and the async app in app/aio.py.
+    """
+    # --- LOAD MODELS ---
     print("--- [INFO] Loading models and data... ---")
     try:
         # Load models and store them in the app's config
-        app.config['KMEANS_MODEL'] = joblib.load(app.config['KMEANS_MODEL_PATH'])
-        app.config['ISO_MODEL'] = joblib.load(app.config['ISO_MODEL_PATH'])
-        app.config['SCALER'] = joblib.load(app.config['SCALER_PATH'])
-        app.config['BARANGAYS_DF'] = pd.read_csv(app.config['BARANGAY_CSV_PATH'])
+        app.config['MODEL_REGISTRY'] = ModelRegistry.from_config(app.config)
+        if app.config['MODEL_RUNTIME'] == "compiled":
+            app.config['SCALER'] = load_model(app.config['COMPILED_SCALER_PATH'], "compiled")
+        else:
+            app.config['SCALER'] = load_model(app.config['SCALER_PATH'])
+        app.config['BARANGAYS'] = BarangayRegistry.load(
+            app.config['BARANGAY_CSV_PATH'], app.config['BARANGAY_CACHE_PATH']
+        )
         
         
         
@@ -41,17 +43,65 @@ def create_app(config_class='config.Config'):
         print(f"--- [FATAL ERROR] Model/CSV file not found: {e} ---")
         print("--- [FATAL ERROR] Please check config.py paths and ensure files are deployed. ---")
         
-        app.config['KMEANS_MODEL'] = None
-        app.config['ISO_MODEL'] = None
+        app.config['MODEL_REGISTRY'] = None
         app.config['SCALER'] = None
-        app.config['BARANGAYS_DF'] = pd.DataFrame()
+        app.config['BARANGAYS'] = BarangayRegistry.empty()
     except Exception as e:
         print(f"--- [FATAL ERROR] A critical error occurred loading models: {e} ---")
         raise e
     # --- END MODEL LOADING ---
 
+    # Per-worker rolling rainfall features, updated as new days arrive
+    app.config['FEATURE_STORE'] = FeatureStore()
+
+    # The one /predict_all pipeline both app factories serve from
+    app.config['PIPELINE'] = PredictionPipeline.from_config(app.config)
+
+def create_app(config_class='config.Config'):
+    
+    app = Flask(__name__)
+    app.config.from_object(config_class) 
+
+    # --- CORS CONFIG ---
+    frontend_url = os.getenv("FRONTEND_URL", "http://localhost:5173")
+    print(f"--- [INFO] Configuring CORS for origin: {frontend_url} ---")
+    CORS(app, 
+         origins=[frontend_url],
+         supports_credentials=True
+    )
+
+    load_resources(app)
+
+    # Concurrent /predict_all calls share one computation
+    app.config['COALESCER'] = Coalescer(
+        app.config['COALESCE_LOCK_DIR'], app.config['COALESCE_SHARE_SECONDS']
+    )
+
+    # Admission control + stale-while-revalidate cache for /predict_all
+    app.config['ADMISSION'] = AdmissionController(
+        app.config['ADMISSION_MAX_CONCURRENT'],
+        app.config['ADMISSION_MAX_QUEUE'],
+        app.config['ADMISSION_QUEUE_TIMEOUT'],
+    )
+
+    # Admin-triggered profiling windows (inert unless PROFILE_TOKEN is set)
+    app.config['PROFILE_WINDOW'] = CaptureWindow(
+        app.config['PROFILE_DIR'],
+        app.config['PROFILE_INTERVAL'],
+        app.config['PROFILE_MAX_SECONDS'],
+    )
+
     with app.app_context():
         from . import routes
+        from .services import keep_last_good, make_refresher
         app.register_blueprint(routes.main_bp)
 
+    app.config['PREDICTION_CACHE'] = StaleWhileRevalidate(
+        make_refresher(app),
+        fresh_seconds=app.config['SWR_FRESH_SECONDS'],
+        max_stale_seconds=app.config['SWR_MAX_STALE_SECONDS'],
+        wait_seconds=app.config['SWR_WAIT_SECONDS'],
+        merge=partial(keep_last_good, max_stale_seconds=app.config['SWR_MAX_STALE_SECONDS']),
+    )
+
     return app
\ No newline at end of file
@@ -0,0 +1,136 @@
+"""
+Asyncio-native serving path for the prediction API.
+
+Same routes and payloads as `main_bp`, served by Quart under an ASGI server:
+
+    uvicorn --factory "app.aio:create_async_app" --host 0.0.0.0 --port $PORT
+
+Upstream Open-Meteo calls share one `httpx.AsyncClient`, so a single process
+can hold hundreds of requests waiting on the network. Model scoring still
+runs in an executor thread (see services.get_all_predictions_async).
+"""
+import asyncio
+import os
+from functools import partial
+import httpx
+from quart import Blueprint, Quart, current_app, jsonify
+from quart_cors import cors
+
+from . import load_resources
+from .serving import Overloaded, StaleWhileRevalidate
+from .services import get_all_predictions_async, keep_last_good
+
+async_bp = Blueprint('main_async', __name__)
+
+
+async def _shared_predictions(app) -> list:
+    """Single-flight for the event loop: concurrent callers await one task."""
+    task = app.extensions.get("predict_all_task")
+    if task is None or task.done():
+        task = asyncio.ensure_future(
+            get_all_predictions_async(app.config)
+        )
+        app.extensions["predict_all_task"] = task
+    # shield: one caller disconnecting must not cancel the shared work
+    return await asyncio.shield(task)
+
+
+@async_bp.route("/predict_all", methods=["GET"])
+async def predict_all():
+    """
+    API endpoint to fetch predictions for all barangays.
+    """
+    app = current_app._get_current_object()
+    try:
+        if app.config['SERVING_MODE'] != "swr":
+            return jsonify(await _shared_predictions(app))
+
+        # Never holds a thread: a cold-cache wait is awaited on the loop
+        results, age, state = await app.config['PREDICTION_CACHE'].get_async()
+
+        response = jsonify(results)
+        response.headers["X-Cache"] = state
+        response.headers["Age"] = str(int(age))
+        return response
+
+    except Overloaded as e:
+        response = jsonify({"error": "Service busy, please retry.", "reason": e.reason})
+        response.headers["Retry-After"] = str(e.retry_after)
+        return response, 503
+
+    except Exception as e:
+        print(f"🔴 Unhandled error in /predict_all endpoint: {e}")
+        return jsonify({"error": "An internal server error occurred"}), 500
+
+
+@async_bp.route("/models/stats", methods=["GET"])
+async def model_stats():
+    """
+    Per-model latency, ensemble/shadow configuration and recent shadow results.
+    """
+    registry = current_app.config['MODEL_REGISTRY']
+    return jsonify(registry.stats() if registry else {"error": "Models not loaded."})
+
+
+@async_bp.route("/metrics/pipeline", methods=["GET"])
+async def pipeline_metrics():
+    """
+    Per-stage latency of the prediction pipeline.
+    """
+    return jsonify(current_app.config['PIPELINE'].stats())
+
+
+@async_bp.route("/metrics/serving", methods=["GET"])
+async def serving_metrics():
+    """
+    Prediction cache age and upstream client settings.
+    """
+    task = current_app.extensions.get("predict_all_task")
+    return jsonify({
+        "mode": current_app.config['SERVING_MODE'],
+        "server": "asgi",
+        "cache": current_app.config['PREDICTION_CACHE'].metrics(),
+        "in_flight_refresh": bool(task and not task.done()),
+        "upstream_concurrency": current_app.config['UPSTREAM_CONCURRENCY'],
+    })
+
+
+def create_async_app(config_class='config.Config'):
+
+    app = Quart(__name__)
+    app.config.from_object(config_class)
+
+    # --- CORS CONFIG ---
+    frontend_url = os.getenv("FRONTEND_URL", "http://localhost:5173")
+    print(f"--- [INFO] Configuring CORS for origin: {frontend_url} ---")
+    app = cors(app, allow_origin=[frontend_url], allow_credentials=True)
+
+    load_resources(app)
+    app.register_blueprint(async_bp)
+
+    @app.before_serving
+    async def start_client():
+        loop = asyncio.get_running_loop()
+        # Shared by the pipeline's async fetch stage
+        app.config['HTTP_CLIENT'] = httpx.AsyncClient(
+            timeout=app.config['UPSTREAM_TIMEOUT'],
+            limits=httpx.Limits(max_connections=app.config['UPSTREAM_CONCURRENCY']),
+        )
+
+        # The SWR refresh runs on a worker thread; hop back onto the loop
+        def refresh() -> list:
+            return asyncio.run_coroutine_threadsafe(_shared_predictions(app), loop).result()
+
+        app.config['PREDICTION_CACHE'] = StaleWhileRevalidate(
+            refresh,
+            fresh_seconds=app.config['SWR_FRESH_SECONDS'],
+            max_stale_seconds=app.config['SWR_MAX_STALE_SECONDS'],
+            wait_seconds=app.config['SWR_WAIT_SECONDS'],
+            merge=partial(keep_last_good, max_stale_seconds=app.config['SWR_MAX_STALE_SECONDS']),
+        )
+
+    @app.after_serving
+    async def close_client():
+        await app.config['HTTP_CLIENT'].aclose()
+
+    return app
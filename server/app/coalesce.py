@@ -0,0 +1,121 @@
+import os
+import pickle
+import stat
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines: in-process coalescing only
+    fcntl = None
+
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class Coalescer:
+    """
+    Single-flight execution for expensive, identical requests.
+
+    Within a worker, concurrent callers with the same key wait on one
+    in-flight call and share its result (or exception). Across workers, the
+    thread that does the work first takes an exclusive file lock for the key.
+    A worker that had to wait for that lock reuses the result the previous
+    holder left on disk, provided it finished after this request arrived
+    (minus `share_seconds` of grace), instead of computing it again.
+    """
+
+    def __init__(self, lock_dir=None, share_seconds=2.0):
+        self.lock_dir = lock_dir if fcntl else None
+        self.share_seconds = share_seconds
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.stats = {"leader": 0, "follower": 0, "shared_across_workers": 0}
+        if self.lock_dir and not self._private_dir(self.lock_dir):
+            print(f"--- [WARN] {self.lock_dir} is not a private directory; coalescing within this worker only ---")
+            self.lock_dir = None
+
+    @staticmethod
+    def _private_dir(path) -> bool:
+        """
+        Results are unpickled from `path`, so it must be ours and writable by
+        nobody else; otherwise another local user could plant a pickle.
+        """
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        st = os.lstat(path)
+        return (
+            stat.S_ISDIR(st.st_mode)
+            and st.st_uid == os.geteuid()
+            and not st.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+        )
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def do(self, key: str, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            self._count("follower")
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        self._count("leader")
+        try:
+            call.result = self._across_workers(key, fn) if self.lock_dir else fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    def _across_workers(self, key, fn):
+        requested_at = time.time()
+        lock_path = os.path.join(self.lock_dir, f"{key}.lock")
+        result_path = os.path.join(self.lock_dir, f"{key}.pickle")
+
+        with open(lock_path, "a+") as lease:
+            fcntl.flock(lease, fcntl.LOCK_EX)
+            try:
+                shared = self._read(result_path)
+                if shared and shared["finished_at"] >= requested_at - self.share_seconds:
+                    self._count("shared_across_workers")
+                    return shared["result"]
+
+                result = fn()
+                self._write(result_path, {"finished_at": time.time(), "result": result})
+                return result
+            finally:
+                fcntl.flock(lease, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _read(path):
+        try:
+            with open(path, "rb") as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    @staticmethod
+    def _write(path, payload):
+        # Write-then-rename so readers never see a partial file
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
@@ -0,0 +1,181 @@
+"""
+NumPy-only runtime for models exported by ai_training/export_models.py.
+
+Each exported model is a single .npz holding flat arrays (scaler stats,
+centroids, tree nodes, MLP weights) plus a `kind` tag. The classes below
+mirror the sklearn methods the server calls (`transform`, `predict`,
+`predict_proba`, ...), so they drop into the model backends in place of the
+pickles without importing sklearn, scipy or xgboost.
+
+This module must only depend on numpy: export_models.py imports it
+directly (outside the Flask app) for its parity check.
+"""
+import numpy as np
+
+LOADERS = {}
+
+def _loader(kind):
+    def wrap(cls):
+        LOADERS[kind] = cls
+        return cls
+    return wrap
+
+
+def load(path):
+    """Loads a compiled model, dispatching on its stored `kind`."""
+    with np.load(path, allow_pickle=False) as data:
+        arrays = {key: data[key] for key in data.files}
+    kind = str(arrays.pop("kind"))
+    if kind not in LOADERS:
+        raise ValueError(f"Unknown compiled model kind '{kind}' in {path}")
+    return LOADERS[kind](arrays)
+
+
+def _as_matrix(X, feature_names=None):
+    """Accepts a DataFrame (reordered by name when we know the names) or array."""
+    if feature_names is not None and hasattr(X, "columns"):
+        X = X[list(feature_names)]
+    return np.asarray(X, dtype=np.float64)
+
+
+def _apply_trees(X, arrays, strict=False):
+    """
+    Walks every tree for every row at once.
+
+    Returns an (n_rows, n_trees) array of leaf node indices into the
+    flattened node arrays. sklearn splits go left on `x <= threshold`;
+    XGBoost splits go left on `x < threshold` and send NaN to `missing`.
+    """
+    feature, threshold = arrays["feature"], arrays["threshold"]
+    left, right = arrays["left"], arrays["right"]
+    missing = arrays.get("missing")
+
+    rows = np.arange(X.shape[0])[:, None]
+    node = np.broadcast_to(arrays["roots"], (X.shape[0], len(arrays["roots"]))).copy()
+    for _ in range(int(arrays["max_depth"]) + 1):
+        f = feature[node]
+        active = f >= 0
+        if not active.any():
+            break
+        x = X[rows, np.where(active, f, 0)]
+        thr = threshold[node]
+        go_left = x < thr if strict else x <= thr
+        nxt = np.where(go_left, left[node], right[node])
+        if missing is not None:
+            nxt = np.where(np.isnan(x), missing[node], nxt)
+        node = np.where(active, nxt, node)
+    return node
+
+
+@_loader("scaler")
+class CompiledScaler:
+    def __init__(self, a):
+        self.mean_ = a["mean"]
+        self.scale_ = a["scale"]
+        self.feature_names_in_ = a["feature_names"] if a["feature_names"].size else None
+
+    def transform(self, X):
+        return (_as_matrix(X, self.feature_names_in_) - self.mean_) / self.scale_
+
+
+@_loader("kmeans")
+class CompiledKMeans:
+    def __init__(self, a):
+        self.cluster_centers_ = a["centers"]
+
+    def predict(self, X):
+        X = _as_matrix(X)
+        # argmin ||x - c||^2 == argmin (||c||^2 - 2 x.c)
+        c = self.cluster_centers_
+        d = (c * c).sum(axis=1) - 2.0 * X @ c.T
+        return d.argmin(axis=1)
+
+
+@_loader("isolation_forest")
+class CompiledIsolationForest:
+    def __init__(self, a):
+        self.arrays = a
+        self.offset_ = float(a["offset"])
+
+    def score_samples(self, X):
+        # sklearn scores trees on float32 input
+        X = _as_matrix(X).astype(np.float32)
+        leaves = _apply_trees(X, self.arrays)
+        depths = self.arrays["leaf_value"][leaves].sum(axis=1)
+        return -(2.0 ** (-depths / float(self.arrays["denominator"])))
+
+    def decision_function(self, X):
+        return self.score_samples(X) - self.offset_
+
+    def predict(self, X):
+        return np.where(self.decision_function(X) < 0, -1, 1)
+
+
+class _CompiledClassifier:
+    def __init__(self, a):
+        self.arrays = a
+        self.classes_ = a["classes"]
+        self.feature_names_in_ = a["feature_names"] if a["feature_names"].size else None
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+
+@_loader("forest_classifier")
+class CompiledForestClassifier(_CompiledClassifier):
+    def predict_proba(self, X):
+        X = _as_matrix(X, self.feature_names_in_).astype(np.float32)
+        leaves = _apply_trees(X, self.arrays)
+        return self.arrays["value"][leaves].mean(axis=1)
+
+
+@_loader("xgb_classifier")
+class CompiledXGBClassifier(_CompiledClassifier):
+    def predict_proba(self, X):
+        X = _as_matrix(X, self.feature_names_in_).astype(np.float32)
+        leaves = _apply_trees(X, self.arrays, strict=True)
+        contrib = self.arrays["leaf_value"][leaves]
+        tree_class = self.arrays["tree_class"]
+        n_groups = int(self.arrays["n_groups"])
+
+        margin = np.zeros((X.shape[0], n_groups)) + self.arrays["base_margin"]
+        for g in range(n_groups):
+            margin[:, g] += contrib[:, tree_class == g].sum(axis=1)
+
+        if n_groups == 1:
+            p = 1.0 / (1.0 + np.exp(-margin[:, 0]))
+            return np.column_stack([1.0 - p, p])
+        e = np.exp(margin - margin.max(axis=1, keepdims=True))
+        return e / e.sum(axis=1, keepdims=True)
+
+
+ACTIVATIONS = {
+    "identity": lambda z: z,
+    "relu": lambda z: np.maximum(z, 0),
+    "tanh": np.tanh,
+    "logistic": lambda z: 1.0 / (1.0 + np.exp(-z)),
+}
+
+
+@_loader("mlp_classifier")
+class CompiledMLPClassifier(_CompiledClassifier):
+    def __init__(self, a):
+        super().__init__(a)
+        n_layers = int(a["n_layers"])
+        self.coefs = [a[f"coef_{i}"] for i in range(n_layers)]
+        self.intercepts = [a[f"intercept_{i}"] for i in range(n_layers)]
+        self.activation = str(a["activation"])
+        self.out_activation = str(a["out_activation"])
+
+    def predict_proba(self, X):
+        z = _as_matrix(X, self.feature_names_in_)
+        hidden = ACTIVATIONS[self.activation]
+        for i, (W, b) in enumerate(zip(self.coefs, self.intercepts)):
+            z = z @ W + b
+            if i < len(self.coefs) - 1:
+                z = hidden(z)
+        if self.out_activation == "softmax":
+            e = np.exp(z - z.max(axis=1, keepdims=True))
+            return e / e.sum(axis=1, keepdims=True)
+        p = ACTIVATIONS[self.out_activation](z).ravel()
+        return np.column_stack([1.0 - p, p])
@@ -1,9 +1,14 @@
+import asyncio
+import math
 import requests
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
+from feature_store import FeatureStore
 
-def get_openmeteo_data(lat: float, lon: float) -> dict:
-    """Fetch rainfall, weather conditions, and river discharge data from Open-Meteo APIs."""
-    
+# Open-Meteo returns daily values in this timezone (see `&timezone=` below)
+MANILA = timezone(timedelta(hours=8))
+
+def build_urls(lat: float, lon: float) -> tuple:
+    """Returns the (weather, river discharge) request URLs for a location."""
     # --- 1️⃣ Weather & Rainfall (past 7 days) ---
     precip_url = (
         f"https://api.open-meteo.com/v1/forecast?"
@@ -20,26 +25,86 @@ def get_openmeteo_data(lat: float, lon: float) -> dict:
     river_url = (
         f"https://flood-api.open-meteo.com/v1/flood?"
         f"latitude={lat}&longitude={lon}"
+        f"&past_days=7"
         f"&daily=river_discharge"
         f"&timezone=Asia/Manila"
     )
+    return precip_url, river_url
+
+
+def default_weather(error=None) -> dict:
+    """
+    Default structure returned when the upstream calls fail. `upstream_error`
+    marks the row as a placeholder, so callers can tell it from real data.
+    """
+    weather = {
+        "time": datetime.now(timezone.utc),
+        "precip": 0, "precip_3d_sum": 0, "precip_7d_sum": 0,
+        "precip_lag1": 0, "precip_lag2": 0,
+        "river_discharge": 0,
+        "temp_max": 0, "temp_min": 0,
+        "humidity": 0, "pressure": 0, "windspeed": 0,
+        "precip_prob": 0
+    }
+    if error is not None:
+        weather["upstream_error"] = str(error)
+    return weather
+
+
+def get_openmeteo_data(lat: float, lon: float, store: FeatureStore = None, key=None) -> dict:
+    """
+    Fetch rainfall, weather conditions, and river discharge data from Open-Meteo APIs.
+
+    Daily precipitation and discharge up to today are pushed into `store`
+    (keyed by `key`), which supplies the lag and rolling-sum features. A
+    long-lived store only folds in new days; without one, a throwaway
+    store is built from this response.
+    """
+    precip_url, river_url = build_urls(lat, lon)
 
     try:
-        precip_res = requests.get(precip_url, timeout=10).json()
-        river_res = requests.get(river_url, timeout=10).json()
+        precip_res = requests.get(precip_url, timeout=10)
+        river_res = requests.get(river_url, timeout=10)
+        precip_res.raise_for_status()
+        river_res.raise_for_status()
+        precip_res, river_res = precip_res.json(), river_res.json()
     except Exception as e:
         print("⚠️ Error fetching Open-Meteo data:", e)
         # Return a default structure on failure
-        return {
-            "time": datetime.now(timezone.utc),
-            "precip": 0, "precip_3d_sum": 0, "precip_7d_sum": 0,
-            "river_discharge": 0,
-            "temp_max": 0, "temp_min": 0,
-            "humidity": 0, "pressure": 0, "windspeed": 0,
-            "precip_prob": 0
-        }
-
-    daily = precip_res.get("daily", {})
+        return default_weather(e)
+
+    return parse_openmeteo(precip_res, river_res, lat, lon, store, key)
+
+
+async def get_openmeteo_data_async(client, lat: float, lon: float, store: FeatureStore = None, key=None) -> dict:
+    """
+    Async variant of get_openmeteo_data using a shared `httpx.AsyncClient`.
+    Both upstream calls are issued concurrently.
+    """
+    precip_url, river_url = build_urls(lat, lon)
+
+    try:
+        precip_res, river_res = await asyncio.gather(client.get(precip_url), client.get(river_url))
+        precip_res.raise_for_status()
+        river_res.raise_for_status()
+        precip_res, river_res = precip_res.json(), river_res.json()
+    except Exception as e:
+        print("⚠️ Error fetching Open-Meteo data:", e)
+        return default_weather(e)
+
+    return parse_openmeteo(precip_res, river_res, lat, lon, store, key)
+
+
+def parse_openmeteo(precip_res: dict, river_res: dict, lat: float, lon: float,
+                    store: FeatureStore = None, key=None) -> dict:
+    """Turns the two upstream JSON payloads into the weather/feature dict."""
+    # The forecast API also returns future days; keep everything up to today
+    today = datetime.now(MANILA).strftime("%Y-%m-%d")
+    daily = _up_to(precip_res.get("daily", {}), today)
+    river_daily = river_res.get("daily", {})
+    discharge_by_day = dict(zip(river_daily.get("time", []), river_daily.get("river_discharge", [])))
+
+    days = daily.get("time", [])
     precip_list = daily.get("precipitation_sum", [])
     precip_prob_list = daily.get("precipitation_probability_mean", [])
     temp_max_list = daily.get("temperature_2m_max", [])
@@ -47,13 +112,22 @@ def get_openmeteo_data(lat: float, lon: float) -> dict:
     humidity_list = daily.get("relative_humidity_2m_max", [])
     pressure_list = daily.get("surface_pressure_max", [])
     windspeed_list = daily.get("windspeed_10m_max", [])
-    discharge_list = river_res.get("daily", {}).get("river_discharge", [])
 
-    # Handle missing values safely
-    precip = precip_list[-1] if precip_list else 0
-    precip_3d_sum = sum(precip_list[-3:]) if len(precip_list) >= 3 else sum(precip_list)
-    precip_7d_sum = sum(precip_list[-7:]) if len(precip_list) >= 7 else sum(precip_list)
-    river_discharge = discharge_list[-1] if discharge_list else 0
+    # Lag / rolling features come from the shared feature store
+    if store is None:
+        store, key = FeatureStore(), (lat, lon)
+    features = store.ingest(
+        key if key is not None else (lat, lon),
+        days, precip_list, [discharge_by_day.get(day) for day in days],
+    )
+
+    # Handle missing values safely (the store keeps NaN for null days)
+    precip = _or_zero(features["precip"])
+    precip_lag1 = _or_zero(features["precip_lag1"])
+    precip_lag2 = _or_zero(features["precip_lag2"])
+    precip_3d_sum = _or_zero(features["precip_3d_sum"])
+    precip_7d_sum = _or_zero(features["precip_7d_sum"])
+    river_discharge = _or_zero(features["river_discharge"])
 
     # Extra weather info (latest day)
     temp_max = temp_max_list[-1] if temp_max_list else 0
@@ -68,6 +142,8 @@ def get_openmeteo_data(lat: float, lon: float) -> dict:
         "precip": precip,
         "precip_3d_sum": precip_3d_sum,
         "precip_7d_sum": precip_7d_sum,
+        "precip_lag1": precip_lag1,
+        "precip_lag2": precip_lag2,
         "river_discharge": river_discharge,
         "temp_max": temp_max,
         "temp_min": temp_min,
@@ -75,4 +151,18 @@ def get_openmeteo_data(lat: float, lon: float) -> dict:
         "pressure": pressure,
         "windspeed": windspeed,
         "precip_prob": precip_prob,
-    }
\ No newline at end of file
+    }
+
+
+def _or_zero(value):
+    """0 for None and NaN, the value otherwise."""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return 0
+    return value
+
+
+def _up_to(daily: dict, day: str) -> dict:
+    """Truncates every daily series to the entries on or before `day`."""
+    days = daily.get("time", [])
+    n = sum(1 for d in days if d <= day)
+    return {name: values[:n] for name, values in daily.items()}
\ No newline at end of file
@@ -0,0 +1,205 @@
+"""
+The /predict_all pipeline: locate -> fetch -> featurize -> score -> serialize.
+
+Every stage is a plain function taking the app config first, so it can be
+swapped (`pipeline.replace("fetch", fn)`), timed (per-stage latency in
+`pipeline.stats()`), run on its own (`pipeline.run_stage(...)` or
+`run_stage_async`) and cached (`cache_seconds`). Both the Flask app and the
+async app build their /predict_all responses from one PredictionPipeline;
+a stage may also carry a coroutine version (`async_fn`) for the async path,
+as `fetch` does.
+"""
+import asyncio
+import threading
+import time
+
+from .openmeteo import get_openmeteo_data, get_openmeteo_data_async
+from .predictor import LatencyStats, PredictionError, featurize, score
+
+
+# --- Default stage implementations ---
+
+def locate(config) -> list:
+    """(name, lat, lon) for every barangay."""
+    return list(config['BARANGAYS'].locations())
+
+def fetch(config, locations) -> list:
+    """Weather + rolling features per location, fetched one after another."""
+    store = config['FEATURE_STORE']
+    return [
+        get_openmeteo_data(lat, lon, store=store, key=name)
+        for name, lat, lon in locations
+    ]
+
+async def fetch_async(config, locations) -> list:
+    """Same as `fetch`, with upstream calls running concurrently on `HTTP_CLIENT`."""
+    client = config['HTTP_CLIENT']
+    store = config['FEATURE_STORE']
+    limit = asyncio.Semaphore(config['UPSTREAM_CONCURRENCY'])
+
+    async def one(name, lat, lon):
+        async with limit:
+            return await get_openmeteo_data_async(client, lat, lon, store=store, key=name)
+
+    return list(await asyncio.gather(*(one(*loc) for loc in locations)))
+
+def serialize(config, locations, weathers, predictions) -> list:
+    """Merges locations, weather and predictions into the response rows."""
+    results = []
+    for (name, lat, lon), weather, prediction in zip(locations, weathers, predictions):
+        results.append({
+            "barangay": name,
+            "lat": lat,
+            "lon": lon,
+            "time": weather["time"].strftime("%Y-%m-%d %H:%M:%S"),
+
+            # Unpack the raw weather data
+            **weather,
+
+            # Unpack the prediction results
+            **prediction
+        })
+    return results
+
+
+class Stage:
+    """
+    One named, timed and optionally cached pipeline step.
+
+    `fn` serves the sync entry point. `async_fn`, if given, is the coroutine
+    version used by the async entry point; without it `run_async` runs `fn`
+    in the default executor.
+    """
+
+    def __init__(self, name, fn, cache_seconds=0, async_fn=None):
+        self.name = name
+        self.fn = fn
+        self.async_fn = async_fn
+        self.cache_seconds = cache_seconds
+        self.stats = LatencyStats()
+        self._cache = None  # (key, stored_at, value)
+        self._lock = threading.Lock()
+
+    def _cached(self, key):
+        if self.cache_seconds and self._cache is not None:
+            cached_key, stored_at, value = self._cache
+            if cached_key == key and time.time() - stored_at <= self.cache_seconds:
+                return True, value
+        return False, None
+
+    def _store(self, key, value):
+        if self.cache_seconds:
+            with self._lock:
+                self._cache = (key, time.time(), value)
+
+    def __call__(self, *args, cache_key=None, rows=0):
+        hit, value = self._cached(cache_key)
+        if hit:
+            return value
+        start = time.perf_counter()
+        try:
+            value = self.fn(*args)
+        except Exception:
+            self.stats.record(time.perf_counter() - start, rows, ok=False)
+            raise
+        self.stats.record(time.perf_counter() - start, rows)
+        self._store(cache_key, value)
+        return value
+
+    async def run_async(self, *args, cache_key=None, rows=0):
+        hit, value = self._cached(cache_key)
+        if hit:
+            return value
+        start = time.perf_counter()
+        try:
+            if self.async_fn is not None:
+                value = await self.async_fn(*args)
+            else:
+                value = await asyncio.get_running_loop().run_in_executor(None, self.fn, *args)
+        except Exception:
+            self.stats.record(time.perf_counter() - start, rows, ok=False)
+            raise
+        self.stats.record(time.perf_counter() - start, rows)
+        self._store(cache_key, value)
+        return value
+
+
+class PredictionPipeline:
+    STAGES = ("locate", "fetch", "featurize", "score", "serialize")
+
+    def __init__(self, config, cache_seconds=None, **overrides):
+        self.config = config
+        cache_seconds = cache_seconds or {}
+        defaults = {
+            "locate": locate,
+            "fetch": fetch,
+            "featurize": featurize,
+            "score": score,
+            "serialize": serialize,
+        }
+        defaults.update(overrides)
+        async_defaults = {} if "fetch" in overrides else {"fetch": fetch_async}
+        self.stages = {
+            name: Stage(name, defaults[name], cache_seconds.get(name, 0), async_defaults.get(name))
+            for name in self.STAGES
+        }
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config, cache_seconds={
+            "locate": config['PIPELINE_LOCATE_CACHE_SECONDS'],
+            "fetch": config['PIPELINE_FETCH_CACHE_SECONDS'],
+        })
+
+    def replace(self, name, fn, cache_seconds=None, async_fn=None):
+        """
+        Swaps one stage's implementation for both entry points (keeps its
+        cache setting by default). Pass `async_fn` for a coroutine version;
+        otherwise the async path runs `fn` in an executor.
+        """
+        old = self.stages[name]
+        self.stages[name] = Stage(
+            name, fn, old.cache_seconds if cache_seconds is None else cache_seconds, async_fn
+        )
+
+    def run_stage(self, name, *args):
+        """Runs a single stage with the pipeline's config (for benchmarks)."""
+        return self.stages[name](self.config, *args)
+
+    async def run_stage_async(self, name, *args):
+        """Async counterpart of run_stage."""
+        return await self.stages[name].run_async(self.config, *args)
+
+    def _locate(self):
+        return self.stages["locate"](self.config, cache_key="all")
+
+    def _finish(self, locations, weathers) -> list:
+        """featurize -> score -> serialize, shared by the sync and async paths."""
+        n = len(locations)
+        if not n:
+            return []
+        try:
+            raw, X_scaled = self.stages["featurize"](self.config, weathers, rows=n)
+            predictions = self.stages["score"](self.config, raw, X_scaled, rows=n)
+        except PredictionError as e:
+            predictions = [{"error": str(e)} for _ in locations]
+        return self.stages["serialize"](self.config, locations, weathers, predictions, rows=n)
+
+    def run(self) -> list:
+        locations = self._locate()
+        names = tuple(name for name, _, _ in locations)
+        weathers = self.stages["fetch"](self.config, locations, cache_key=names, rows=len(locations))
+        return self._finish(locations, weathers)
+
+    async def run_async(self) -> list:
+        """Async fetch; CPU-bound stages run in the default executor."""
+        loop = asyncio.get_running_loop()
+        locations = self._locate()
+        names = tuple(name for name, _, _ in locations)
+        weathers = await self.stages["fetch"].run_async(
+            self.config, locations, cache_key=names, rows=len(locations)
+        )
+        return await loop.run_in_executor(None, self._finish, locations, weathers)
+
+    def stats(self) -> dict:
+        return {name: stage.stats.snapshot() for name, stage in self.stages.items()}
@@ -1,90 +1,354 @@
+import time
+import threading
+import joblib
+import numpy as np
 import pandas as pd
 import warnings
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from flask import current_app # This is safe to import
 
 # Suppress irrelevant sklearn warnings
 warnings.filterwarnings("ignore", message="X has feature names")
 
+# Raw feature columns built from the weather data
+RAW_FEATURES = [
+    "precip",
+    "river_discharge",
+    "precip_lag1",
+    "precip_lag2",
+    "precip_3d_sum",
+    "precip_7d_sum",
+    "month",
+    "day_of_year",
+    "weekday",
+]
+
+# Names the scaler/unsupervised models were trained on
+SCALER_RENAMES = {
+    "precip": "precip_weighted",
+    "precip_3d_sum": "precip_3d_sum_weighted",
+    "precip_7d_sum": "precip_7d_sum_weighted",
+    "river_discharge": "river_discharge_weighted",
+}
+
+
+def load_model(path, runtime="pickle"):
+    """Loads a pickled model, or its NumPy export when runtime is 'compiled'."""
+    if runtime == "compiled":
+        from . import compiled
+        return compiled.load(path)
+    return joblib.load(path)
+
+
+# --- Latency bookkeeping ---
+
+class LatencyStats:
+    """Rolling per-model latency (last `window` calls) plus lifetime totals."""
+
+    def __init__(self, window=500):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.rows = 0
+        self.errors = 0
+
+    def record(self, seconds, rows, ok=True):
+        with self._lock:
+            self._samples.append(seconds)
+            self.calls += 1
+            self.rows += rows
+            if not ok:
+                self.errors += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            samples = sorted(self._samples)
+            calls, rows, errors = self.calls, self.rows, self.errors
+        if not samples:
+            return {"calls": calls, "rows": rows, "errors": errors}
+        pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))] * 1000
+        return {
+            "calls": calls,
+            "rows": rows,
+            "errors": errors,
+            "p50_ms": round(pick(0.50), 3),
+            "p95_ms": round(pick(0.95), 3),
+            "max_ms": round(samples[-1] * 1000, 3),
+        }
+
+
+# --- Model backends ---
+
+BACKEND_TYPES = {}
+
+def register_backend(kind):
+    """Class decorator that makes a backend available under `kind` in MODEL_BACKENDS."""
+    def wrap(cls):
+        cls.kind = kind
+        BACKEND_TYPES[kind] = cls
+        return cls
+    return wrap
+
+
+class ModelBackend:
+    """
+    A named model that scores a batch of rows.
+
+    Subclasses implement `load()` and `predict(raw, scaled)`, where `raw` is
+    the unscaled feature DataFrame (RAW_FEATURES plus any configured
+    defaults) and `scaled` is the scaler output for the same rows.
+    """
+    kind = None
+
+    def __init__(self, name, path, runtime="pickle", **options):
+        self.name = name
+        self.path = path
+        self.runtime = runtime
+        self.options = options
+        self.model = None
+        self.stats = LatencyStats()
+
+    def load(self):
+        self.model = load_model(self.path, self.runtime)
+        return self
+
+    def predict(self, raw: pd.DataFrame, scaled: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def timed_predict(self, raw, scaled):
+        start = time.perf_counter()
+        try:
+            out = self.predict(raw, scaled)
+        except Exception:
+            self.stats.record(time.perf_counter() - start, len(raw), ok=False)
+            raise
+        self.stats.record(time.perf_counter() - start, len(raw))
+        return out
+
+
+@register_backend("kmeans")
+class KMeansBackend(ModelBackend):
+    """Risk cluster id per row."""
+
+    def predict(self, raw, scaled):
+        return self.model.predict(scaled).astype(int)
+
+
+@register_backend("isolation_forest")
+class IsolationForestBackend(ModelBackend):
+    """-1 (anomaly) / 1 (normal) per row."""
+
+    def predict(self, raw, scaled):
+        return self.model.predict(scaled).astype(int)
+
+
+@register_backend("classifier")
+class ClassifierBackend(ModelBackend):
+    """
+    Supervised flood classifier (sklearn RandomForest/MLP or XGBClassifier).
+    Returns the probability of the positive (flood) class per row, using
+    the unscaled features the model was fit on.
+    """
+
+    def load(self):
+        super().load()
+        self.features = list(self.options.get("features") or self._model_features())
+        return self
+
+    def _model_features(self):
+        if getattr(self.model, "feature_names_in_", None) is not None:
+            return self.model.feature_names_in_
+        if hasattr(self.model, "get_booster"):
+            return self.model.get_booster().feature_names
+        return RAW_FEATURES
+
+    def predict(self, raw, scaled):
+        proba = self.model.predict_proba(raw.reindex(columns=self.features, fill_value=0))
+        return proba[:, -1]
+
+
+class ModelRegistry:
+    """
+    Loads the configured backends and runs them over a batch.
+
+    Primary models (risk + anomaly) are scored inline. Ensemble members are
+    scored inline and averaged into `flood_probability`. Shadow models are
+    scored on a background thread after the response rows are built, so
+    their cost never shows up in request latency.
+    """
+
+    def __init__(self, backends, primary, ensemble=(), shadow=(), shadow_log_size=1000, shadow_max_pending=2):
+        self.backends = backends
+        self.primary = primary
+        self.ensemble = [n for n in ensemble if n in backends]
+        self.shadow = [n for n in shadow if n in backends]
+        self.shadow_log = deque(maxlen=shadow_log_size)
+        self._shadow_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow") if self.shadow else None
+        # Running + queued shadow batches; beyond that, batches are dropped
+        self._shadow_slots = threading.Semaphore(shadow_max_pending)
+        self.shadow_dropped = 0
+
+    @classmethod
+    def from_config(cls, config):
+        backends = {}
+        runtime = config["MODEL_RUNTIME"]
+        for name, spec in config["MODEL_BACKENDS"].items():
+            spec = dict(spec)
+            kind = spec.pop("kind")
+            path = spec.pop("path")
+            compiled_path = spec.pop("compiled_path", None)
+            if runtime == "compiled":
+                path = compiled_path
+            required = name in config["PRIMARY_MODELS"].values()
+            wanted = required or name in config["ENSEMBLE_MODELS"] or name in config["SHADOW_MODELS"]
+            if not wanted:
+                continue
+            try:
+                backends[name] = BACKEND_TYPES[kind](name, path, runtime=runtime, **spec).load()
+                print(f"--- [INFO] Loaded model backend '{name}' ({kind}, {runtime}) ---")
+            except Exception as e:
+                if required:
+                    raise
+                print(f"--- [WARN] Optional model backend '{name}' not loaded: {e} ---")
+        return cls(
+            backends,
+            primary=config["PRIMARY_MODELS"],
+            ensemble=config["ENSEMBLE_MODELS"],
+            shadow=config["SHADOW_MODELS"],
+        )
+
+    def score(self, raw, scaled) -> dict:
+        """Runs primary and ensemble models; returns {output: ndarray}."""
+        out = {role: self.backends[name].timed_predict(raw, scaled) for role, name in self.primary.items()}
+        if self.ensemble:
+            probs = [self.backends[name].timed_predict(raw, scaled) for name in self.ensemble]
+            out["flood_probability"] = np.mean(probs, axis=0)
+        return out
+
+    def score_shadow(self, raw, scaled, primary_out):
+        """Queues the shadow models, or drops the batch if they are behind; returns immediately."""
+        if not self._shadow_pool:
+            return
+        if not self._shadow_slots.acquire(blocking=False):
+            self.shadow_dropped += 1
+            return
+        future = self._shadow_pool.submit(self._run_shadow, raw.copy(), np.array(scaled), primary_out)
+        future.add_done_callback(lambda _: self._shadow_slots.release())
+
+    def _run_shadow(self, raw, scaled, primary_out):
+        for name in self.shadow:
+            try:
+                pred = self.backends[name].timed_predict(raw, scaled)
+            except Exception as e:
+                print(f"--- [WARN] Shadow model '{name}' failed: {e} ---")
+                continue
+            self.shadow_log.append({
+                "model": name,
+                "time": time.time(),
+                "rows": len(raw),
+                "mean_output": float(np.mean(pred)),
+                # Agreement with the primary anomaly flag (prob >= 0.5 vs -1)
+                "agreement": float(np.mean((pred >= 0.5) == (primary_out["anomaly"] == -1)))
+                if "anomaly" in primary_out else None,
+            })
+
+    def stats(self) -> dict:
+        return {
+            "primary": self.primary,
+            "ensemble": self.ensemble,
+            "shadow": self.shadow,
+            "shadow_dropped": self.shadow_dropped,
+            "latency": {name: b.stats.snapshot() for name, b in self.backends.items()},
+            "recent_shadow": list(self.shadow_log)[-20:],
+        }
+
+
 # --- Functions to be called by other services ---
 
-def get_barangays():
-    """Returns the pre-loaded DataFrame of barangays."""
-    # Get the DF from the app config where it was loaded
-    return current_app.config['BARANGAYS_DF']
+def get_model_stats() -> dict:
+    """Per-model latency and shadow results for the stats endpoint."""
+    registry = current_app.config['MODEL_REGISTRY']
+    return registry.stats() if registry else {"error": "Models not loaded."}
+
+class PredictionError(Exception):
+    """Raised by featurize() when a batch can't be turned into model input."""
 
-def run_prediction(weather_data: dict) -> dict:
+
+def featurize(config, weather_rows: list):
     """
-    Runs the ML prediction on a single row of weather data.
+    Builds the (raw features, scaled features) pair for a batch of weather rows.
     """
-    # --- 1. Get pre-loaded models from app config ---
-    kmeans = current_app.config['KMEANS_MODEL']
-    iso = current_app.config['ISO_MODEL']
-    scaler = current_app.config['SCALER']
-    anomaly_map = current_app.config['ANOMALY_MAP']
-    risk_map = current_app.config['RISK_MAP']
-    
-    if not all([kmeans, iso, scaler]):
+    # --- 1. Get pre-loaded scaler from app config ---
+    scaler = config['SCALER']
+    if config['MODEL_REGISTRY'] is None or scaler is None:
         print("--- [ERROR] Prediction called, but models are not loaded. ---")
-        return {"error": "Models not loaded. Check server logs."}
-        
+        raise PredictionError("Models not loaded. Check server logs.")
+
     # --- 2. Feature Engineering ---
-    df = pd.DataFrame([weather_data])
-    
+    df = pd.DataFrame(weather_rows)
+
     # Convert 'time' string from JSON to datetime object
     try:
         df['time'] = pd.to_datetime(df['time'])
     except Exception as e:
         print(f"--- [ERROR] Could not convert 'time' column to datetime: {e} ---")
-        return {"error": "Invalid time format in weather_data"}
+        raise PredictionError("Invalid time format in weather_data")
 
-    df["precip_lag1"] = df["precip"]
-    df["precip_lag2"] = df["precip"]
+    # Lags come from the feature store; fall back to today's value if absent
+    for lag in ("precip_lag1", "precip_lag2"):
+        df[lag] = df[lag].fillna(0) if lag in df else df["precip"]
     df["month"] = df["time"].dt.month
     df["day_of_year"] = df["time"].dt.dayofyear
     df["weekday"] = df["time"].dt.weekday
 
-    # Define the features our model expects
-    X_input = df[
-        [
-            "precip",
-            "river_discharge",
-            "precip_lag1",
-            "precip_lag2",
-            "precip_3d_sum",
-            "precip_7d_sum",
-            "month",
-            "day_of_year",
-            "weekday",
-        ]
-    ]
-    
+    # Raw features (for supervised models) plus configured defaults
+    raw = df[RAW_FEATURES].copy()
+    for col, value in config['FEATURE_DEFAULTS'].items():
+        if col not in raw:
+            raw[col] = value
+
     # Rename columns to match what the scaler/model was trained on
-    X_input = X_input.rename(columns={
-        "precip": "precip_weighted",
-        "precip_3d_sum": "precip_3d_sum_weighted",
-        "precip_7d_sum": "precip_7d_sum_weighted",
-        "river_discharge": "river_discharge_weighted",
-    })
+    X_input = raw[RAW_FEATURES].rename(columns=SCALER_RENAMES)
 
     # --- 3. Scaling ---
     try:
         X_scaled = scaler.transform(X_input)
     except Exception as e:
         print(f"--- [ERROR] Scaling failed: {e} ---")
-        return {"error": f"Scaling failed: {e}. Check input data."}
+        raise PredictionError(f"Scaling failed: {e}. Check input data.")
+
+    return raw, X_scaled
 
-    # --- 4. Prediction ---
-    cluster = int(kmeans.predict(X_scaled)[0])
-    anomaly = int(iso.predict(X_scaled)[0])
+def score(config, raw, X_scaled) -> list:
+    """
+    Runs the models over featurized rows and maps the outputs to labels.
+    """
+    registry = config['MODEL_REGISTRY']
+    anomaly_map = config['ANOMALY_MAP']
+    risk_map = config['RISK_MAP']
+
+    # --- 4. Prediction (primary + ensemble inline, shadow in background) ---
+    scores = registry.score(raw, X_scaled)
+    registry.score_shadow(raw, X_scaled, scores)
 
     # --- 5. Mapping Labels ---
-    anomaly_label = anomaly_map.get(anomaly, "Unknown")
-    risk_label = risk_map.get(cluster, "Unknown")
-
-    return {
-        "risk_cluster": cluster,
-        "risk_label": risk_label,
-        "anomaly": anomaly,
-        "anomaly_label": anomaly_label,
-        "message": f"Current flood status: {anomaly_label}. Risk level: {risk_label}."
-    }
\ No newline at end of file
+    results = []
+    for i in range(len(raw)):
+        cluster = int(scores["risk"][i])
+        anomaly = int(scores["anomaly"][i])
+        anomaly_label = anomaly_map.get(anomaly, "Unknown")
+        risk_label = risk_map.get(cluster, "Unknown")
+
+        result = {
+            "risk_cluster": cluster,
+            "risk_label": risk_label,
+            "anomaly": anomaly,
+            "anomaly_label": anomaly_label,
+            "message": f"Current flood status: {anomaly_label}. Risk level: {risk_label}."
+        }
+        if "flood_probability" in scores:
+            result["flood_probability"] = round(float(scores["flood_probability"][i]), 4)
+        results.append(result)
+
+    return results
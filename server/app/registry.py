@@ -0,0 +1,124 @@
+import csv
+import math
+import os
+import sys
+import numpy as np
+
+
+class Barangay:
+    """One registry entry. Slotted, so a record costs a few dozen bytes."""
+
+    __slots__ = ("index", "name", "lat", "lon", "elevation")
+
+    def __init__(self, index, name, lat, lon, elevation):
+        self.index = index
+        self.name = name
+        self.lat = lat
+        self.lon = lon
+        self.elevation = elevation
+
+    def __repr__(self):
+        return f"Barangay({self.index}, {self.name!r}, {self.lat}, {self.lon})"
+
+
+class BarangayRegistry:
+    """
+    Compact, read-only list of barangays.
+
+    Coordinates live in parallel float64 arrays; names are interned and
+    mapped to their index for O(1) lookup. Only the columns the server uses
+    are kept (the CSV's timezone/start_date/end_date columns are dropped).
+    """
+
+    def __init__(self, names, lat, lon, elevation=None):
+        self.names = tuple(sys.intern(str(n)) for n in names)
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self.elevation = (
+            np.asarray(elevation, dtype=np.float64)
+            if elevation is not None else np.full(len(self.names), np.nan)
+        )
+        self._index = {name: i for i, name in enumerate(self.names)}
+        # Plain-float tuples for the hot iteration path (no numpy scalars)
+        self._locations = tuple(zip(self.names, self.lat.tolist(), self.lon.tolist()))
+
+    # --- Loading ---
+
+    @classmethod
+    def empty(cls):
+        return cls([], [], [])
+
+    @classmethod
+    def from_csv(cls, path):
+        names, lat, lon, elevation = [], [], [], []
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            for row in csv.DictReader(f):
+                names.append(row["barangay"])
+                lat.append(float(row["latitude"]))
+                lon.append(float(row["longitude"]))
+                elevation.append(float(row["elevation"]) if row.get("elevation") else math.nan)
+        return cls(names, lat, lon, elevation)
+
+    @classmethod
+    def from_cache(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["names"].tolist(), data["lat"], data["lon"], data["elevation"])
+
+    def save_cache(self, path):
+        # Write-then-rename: workers booting together never see a partial file
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                names=np.array(self.names, dtype=str),
+                lat=self.lat, lon=self.lon, elevation=self.elevation,
+            )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, csv_path, cache_path=None):
+        """
+        Loads from the binary cache when it is newer than the CSV, otherwise
+        parses the CSV and (best effort) refreshes the cache.
+        """
+        if cache_path and os.path.exists(cache_path) \
+                and os.path.getmtime(cache_path) >= os.path.getmtime(csv_path):
+            try:
+                return cls.from_cache(cache_path)
+            except Exception as e:
+                # Unreadable cache: rebuild it from the CSV below
+                print(f"--- [WARN] Ignoring barangay cache {cache_path}: {e} ---")
+
+        registry = cls.from_csv(csv_path)
+        if cache_path:
+            try:
+                registry.save_cache(cache_path)
+            except OSError as e:
+                print(f"--- [WARN] Could not write barangay cache {cache_path}: {e} ---")
+        return registry
+
+    # --- Access ---
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        for i, (name, lat, lon) in enumerate(self._locations):
+            yield Barangay(i, name, lat, lon, float(self.elevation[i]))
+
+    def __getitem__(self, index) -> Barangay:
+        name, lat, lon = self._locations[index]
+        return Barangay(index, name, lat, lon, float(self.elevation[index]))
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def index_of(self, name) -> int:
+        return self._index[name]
+
+    def by_name(self, name) -> Barangay:
+        return self[self._index[name]]
+
+    def locations(self) -> tuple:
+        """(name, lat, lon) tuples in registry order; built once at load."""
+        return self._locations
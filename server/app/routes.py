@@ -1,20 +1,127 @@
-from flask import jsonify, Blueprint
-from .services import get_all_predictions
+import hmac
+import os
+from flask import current_app, jsonify, request, send_from_directory, Blueprint
+from profiling import MODES, ProfilerBusy
+from .services import get_all_predictions_coalesced, get_all_predictions_profiled
+from .predictor import get_model_stats
+from .serving import Overloaded
 
 # Create a "Blueprint", which is a way to organize a group of routes
 main_bp = Blueprint('main', __name__)
 
+def _profile_authorized() -> bool:
+    """Profiling is off unless PROFILE_TOKEN is set and the caller sends it."""
+    token = current_app.config['PROFILE_TOKEN']
+    sent = request.headers.get("X-Profile-Token", "")
+    return bool(token) and hmac.compare_digest(sent.encode(), token.encode())
+
+def _requested_profile():
+    """The `X-Profile` mode for this request, or None (the common, free case)."""
+    mode = request.headers.get("X-Profile")
+    if mode not in MODES or not _profile_authorized():
+        return None
+    return mode
+
 @main_bp.route("/predict_all", methods=["GET"])
 def predict_all():
     """
     API endpoint to fetch predictions for all barangays.
+
+    In "swr" mode the last result is served (with `X-Cache: fresh|stale` and
+    an `Age` header) while a background refresh keeps it current. Rows kept
+    from an earlier refresh because their upstream fetch failed carry
+    `stale: true` and `stale_seconds`.
+
+    With `X-Profile: sample|cprofile` and a valid `X-Profile-Token`, the
+    predictions are computed under a profiler and the written file names
+    come back in the `X-Profile` response header.
     """
     try:
-        # Call the service layer to do all the work
-        results = get_all_predictions()
-        return jsonify(results)
-    
+        with current_app.config['ADMISSION'].admit():
+            mode = _requested_profile()
+            if mode:
+                # Profiled requests compute inline so the profile shows the real work
+                results, paths = get_all_predictions_profiled(mode)
+                response = jsonify(results)
+                response.headers["X-Profile"] = ", ".join(os.path.basename(p) for p in paths)
+                return response
+
+            if current_app.config['SERVING_MODE'] != "swr":
+                # Call the service layer to do all the work
+                return jsonify(get_all_predictions_coalesced())
+
+            results, age, state = current_app.config['PREDICTION_CACHE'].get()
+            response = jsonify(results)
+            response.headers["X-Cache"] = state
+            response.headers["Age"] = str(int(age))
+            return response
+
+    except Overloaded as e:
+        response = jsonify({"error": "Service busy, please retry.", "reason": e.reason})
+        response.headers["Retry-After"] = str(e.retry_after)
+        return response, 503
+
+    except ProfilerBusy as e:
+        return jsonify({"error": str(e)}), 409
+
     except Exception as e:
         # Add error handling for your endpoint
         print(f"🔴 Unhandled error in /predict_all endpoint: {e}")
-        return jsonify({"error": "An internal server error occurred"}), 500
\ No newline at end of file
+        return jsonify({"error": "An internal server error occurred"}), 500
+
+@main_bp.route("/models/stats", methods=["GET"])
+def model_stats():
+    """
+    Per-model latency, ensemble/shadow configuration and recent shadow results.
+    """
+    return jsonify(get_model_stats())
+
+@main_bp.route("/metrics/pipeline", methods=["GET"])
+def pipeline_metrics():
+    """
+    Per-stage latency of the prediction pipeline.
+    """
+    return jsonify(current_app.config['PIPELINE'].stats())
+
+@main_bp.route("/metrics/serving", methods=["GET"])
+def serving_metrics():
+    """
+    Admission queue depth, shed counts and prediction cache age.
+    """
+    return jsonify({
+        "mode": current_app.config['SERVING_MODE'],
+        "admission": current_app.config['ADMISSION'].metrics(),
+        "cache": current_app.config['PREDICTION_CACHE'].metrics(),
+        "coalescing": current_app.config['COALESCER'].stats,
+    })
+
+@main_bp.route("/admin/profile", methods=["GET", "POST"])
+def profile_window():
+    """
+    POST ?seconds=N samples every thread of this worker for N seconds;
+    GET shows the capture status and the profile files written so far.
+    Requires `X-Profile-Token`; looks like a missing route otherwise.
+    """
+    if not _profile_authorized():
+        return jsonify({"error": "Not found"}), 404
+
+    window = current_app.config['PROFILE_WINDOW']
+    if request.method == "POST":
+        try:
+            seconds = window.start(request.args.get("seconds", 30, type=float))
+        except RuntimeError as e:
+            return jsonify({"error": str(e)}), 409
+        return jsonify({"started": True, "seconds": seconds, "pid": os.getpid()}), 202
+
+    profile_dir = current_app.config['PROFILE_DIR']
+    files = sorted(os.listdir(profile_dir)) if os.path.isdir(profile_dir) else []
+    return jsonify({**window.status(), "pid": os.getpid(), "files": files})
+
+@main_bp.route("/admin/profile/<path:name>", methods=["GET"])
+def profile_file(name):
+    """
+    Downloads one profile file (.collapsed, .pstats or .txt).
+    """
+    if not _profile_authorized():
+        return jsonify({"error": "Not found"}), 404
+    return send_from_directory(current_app.config['PROFILE_DIR'], name, as_attachment=True)
@@ -1,35 +1,84 @@
-from .openmeteo import get_openmeteo_data
-from .predictor import get_barangays, run_prediction
+import threading
+from datetime import datetime, timezone
+from flask import current_app
+from profiling import make_profiler, output_base
 
 def get_all_predictions() -> list:
     """
-    Orchestrates the full prediction process for all barangays.
-    """
-    results = []
-    barangays = get_barangays() # Get the pre-loaded df
-
-    for _, row in barangays.iterrows():
-        lat, lon = row["latitude"], row["longitude"]
-        
-        # 1. Fetch data from external API
-        weather = get_openmeteo_data(lat, lon)
-        
-        # 2. Run internal ML prediction
-        prediction = run_prediction(weather)
-        
-        # 3. Combine all data for the final response
-        final_result = {
-            "barangay": row["barangay"],
-            "lat": lat,
-            "lon": lon,
-            "time": weather["time"].strftime("%Y-%m-%d %H:%M:%S"),
-            
-            # Unpack the raw weather data
-            **weather,
-            
-            # Unpack the prediction results
-            **prediction
-        }
-        results.append(final_result)
-        
-    return results
\ No newline at end of file
+    Orchestrates the full prediction process for all barangays
+    (locate -> fetch -> featurize -> score -> serialize, see app/pipeline.py).
+    """
+    return current_app.config['PIPELINE'].run()
+
+async def get_all_predictions_async(config) -> list:
+    """
+    Async version of get_all_predictions: upstream calls run concurrently
+    on config['HTTP_CLIENT'], and the CPU-bound stages run in the default executor.
+    """
+    return await config['PIPELINE'].run_async()
+
+def get_all_predictions_coalesced() -> list:
+    """
+    Same as get_all_predictions, but concurrent callers (in this worker and,
+    via a file lease, in sibling workers) share a single computation.
+    """
+    # The leader runs in its own request context; followers just wait
+    return current_app.config['COALESCER'].do("predict_all", get_all_predictions)
+
+def get_all_predictions_profiled(mode) -> tuple:
+    """
+    Runs get_all_predictions on this thread under a profiler (no cache, no
+    coalescing, so the profile shows the real work). Returns the results and
+    the paths of the written profile files.
+    """
+    config = current_app.config
+    profiler = make_profiler(mode, config['PROFILE_INTERVAL'], thread_ids=[threading.get_ident()])
+    with profiler:
+        results = get_all_predictions()
+    paths = profiler.save(output_base(config['PROFILE_DIR'], "predict_all"))
+    print(f"--- [INFO] /predict_all profiled in {profiler.duration:.2f}s: {paths[0]} ---")
+    return results, paths
+
+class UpstreamUnavailable(Exception):
+    """Raised when a refresh got no usable upstream data at all."""
+
+def keep_last_good(previous, results, max_stale_seconds=None) -> list:
+    """
+    SWR merge: rows whose upstream fetch failed (`upstream_error`) are
+    replaced by that barangay's row from the previous result, marked
+    `stale: true` with `stale_seconds` (age of its upstream data). A row
+    older than `max_stale_seconds` is not carried again; the failed
+    placeholder is served instead. If every row failed, the refresh is
+    rejected so the previous result stays in place.
+    """
+    failed = [row for row in results if row.get("upstream_error")]
+    if not failed:
+        return results
+    if len(failed) == len(results):
+        raise UpstreamUnavailable(f"all {len(results)} upstream fetches failed: {failed[0]['upstream_error']}")
+
+    now = datetime.now(timezone.utc)
+    last = {row["barangay"]: row for row in previous or [] if not row.get("upstream_error")}
+    merged, carried = [], 0
+    for row in results:
+        old = last.get(row["barangay"]) if row.get("upstream_error") else None
+        # `time` is when the row's weather was fetched; carried rows keep it
+        age = None if old is None else (now - old["time"]).total_seconds()
+        if age is None or (max_stale_seconds is not None and age > max_stale_seconds):
+            merged.append(row)
+            continue
+        merged.append({**old, "stale": True, "stale_seconds": int(age)})
+        carried += 1
+
+    print(f"--- [WARN] {len(failed)}/{len(results)} upstream fetches failed; kept {carried} previous rows ---")
+    return merged
+
+def make_refresher(app):
+    """
+    Returns a zero-argument callable that recomputes all predictions inside
+    `app`'s context, for the background stale-while-revalidate refresh.
+    """
+    def refresh() -> list:
+        with app.app_context():
+            return get_all_predictions_coalesced()
+    return refresh
\ No newline at end of file
@@ -0,0 +1,189 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from contextlib import contextmanager
+
+
+class Overloaded(Exception):
+    """Raised when a request is shed instead of served."""
+
+    def __init__(self, reason, retry_after=5):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Bounds how many requests may block a worker at once.
+
+    Up to `max_concurrent` requests run; up to `max_queue` more wait for a
+    slot for at most `queue_timeout` seconds. Anything beyond that is shed
+    immediately, so a slow upstream can't pile up unbounded waiting requests.
+    """
+
+    def __init__(self, max_concurrent=4, max_queue=16, queue_timeout=2.0):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._cond = threading.Condition()
+        self.in_flight = 0
+        self.queued = 0
+        self.counters = {"admitted": 0, "shed_queue_full": 0, "shed_timeout": 0, "max_queue_depth": 0}
+
+    @contextmanager
+    def admit(self):
+        with self._cond:
+            if self.in_flight >= self.max_concurrent:
+                if self.queued >= self.max_queue:
+                    self.counters["shed_queue_full"] += 1
+                    raise Overloaded("queue full")
+                self.queued += 1
+                self.counters["max_queue_depth"] = max(self.counters["max_queue_depth"], self.queued)
+                try:
+                    admitted = self._cond.wait_for(
+                        lambda: self.in_flight < self.max_concurrent, timeout=self.queue_timeout
+                    )
+                finally:
+                    self.queued -= 1
+                if not admitted:
+                    self.counters["shed_timeout"] += 1
+                    raise Overloaded("timed out waiting in queue")
+            self.in_flight += 1
+            self.counters["admitted"] += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.in_flight -= 1
+                self._cond.notify()
+
+    def metrics(self) -> dict:
+        with self._cond:
+            return {
+                "in_flight": self.in_flight,
+                "queue_depth": self.queued,
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                **self.counters,
+            }
+
+
+class StaleWhileRevalidate:
+    """
+    Serves the last computed result and refreshes it in the background.
+
+    - fresh (age <= fresh_seconds): served as-is.
+    - stale (age <= max_stale_seconds): served immediately, marked stale,
+      and one background refresh is started if none is running.
+    - missing or too old: a refresh is started and the request waits for it
+      for at most `wait_seconds`, then gives up with Overloaded.
+
+    Request threads never call `compute` themselves, so upstream slowness
+    shows up as staleness rather than as held workers.
+
+    `merge(previous, result)`, if given, combines a new result with the one
+    it replaces (e.g. keeping old rows where the upstream failed). It may
+    raise to reject the new result and keep serving the previous one.
+    """
+
+    def __init__(self, compute, fresh_seconds=60, max_stale_seconds=3600, wait_seconds=10, merge=None):
+        self.compute = compute
+        self.merge = merge
+        self.fresh_seconds = fresh_seconds
+        self.max_stale_seconds = max_stale_seconds
+        self.wait_seconds = wait_seconds
+        self._lock = threading.Lock()
+        self._done = Future()
+        self._refreshing = False
+        self.result = None
+        self.computed_at = None
+        self.last_duration = None
+        self.last_error = None
+        self.refreshes = 0
+
+    def age(self):
+        return None if self.computed_at is None else time.time() - self.computed_at
+
+    def _cached(self):
+        """(result, age, state) if the cached result can be served without waiting."""
+        age = self.age()
+        if age is not None and age <= self.fresh_seconds:
+            return self.result, age, "fresh"
+        if age is not None and age <= self.max_stale_seconds:
+            self.refresh()
+            return self.result, age, "stale"
+        return None
+
+    def _after_wait(self):
+        if self.computed_at is None:
+            raise Overloaded("no result available yet", retry_after=max(1, int(self.wait_seconds)))
+        age = self.age()
+        # A failed refresh leaves the old (too-old) result in place
+        if age > self.max_stale_seconds:
+            raise Overloaded("upstream unavailable", retry_after=max(1, int(self.wait_seconds)))
+        return self.result, age, "fresh"
+
+    def get(self):
+        """Returns (result, age_seconds, state) with state 'fresh' or 'stale'."""
+        cached = self._cached()
+        if cached is not None:
+            return cached
+        try:
+            self.refresh().result(self.wait_seconds)
+        except FutureTimeout:
+            raise Overloaded("no result available yet", retry_after=max(1, int(self.wait_seconds)))
+        return self._after_wait()
+
+    async def get_async(self):
+        """Same as `get`, but a cold-cache wait happens on the event loop, not a thread."""
+        cached = self._cached()
+        if cached is not None:
+            return cached
+        # shield: a timed-out waiter must not cancel the shared completion future
+        done = asyncio.wrap_future(self.refresh())
+        try:
+            await asyncio.wait_for(asyncio.shield(done), self.wait_seconds)
+        except asyncio.TimeoutError:
+            raise Overloaded("no result available yet", retry_after=max(1, int(self.wait_seconds)))
+        return self._after_wait()
+
+    def refresh(self) -> Future:
+        """Starts a background refresh unless one is running; returns a future set when it ends."""
+        with self._lock:
+            if not self._refreshing:
+                self._refreshing = True
+                self._done = Future()
+                threading.Thread(target=self._run, args=(self._done,), daemon=True, name="swr-refresh").start()
+            return self._done
+
+    def _run(self, done):
+        start = time.perf_counter()
+        try:
+            result = self.compute()
+            if self.merge is not None:
+                result = self.merge(self.result, result)
+            self.result, self.computed_at = result, time.time()
+            self.last_error = None
+        except Exception as e:
+            print(f"--- [ERROR] Background refresh failed: {e} ---")
+            self.last_error = str(e)
+        finally:
+            self.last_duration = time.perf_counter() - start
+            self.refreshes += 1
+            with self._lock:
+                self._refreshing = False
+            done.set_result(None)
+
+    def metrics(self) -> dict:
+        age = self.age()
+        return {
+            "age_seconds": None if age is None else round(age, 1),
+            "refreshing": self._refreshing,
+            "refreshes": self.refreshes,
+            "last_refresh_seconds": None if self.last_duration is None else round(self.last_duration, 3),
+            "last_error": self.last_error,
+            "fresh_seconds": self.fresh_seconds,
+            "max_stale_seconds": self.max_stale_seconds,
+        }
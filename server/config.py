@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 
@@ -12,8 +13,106 @@ class Config:
     ISO_MODEL_PATH = os.path.join(MODEL_DIR, "flood_isolationforest.pkl")
     SCALER_PATH = os.path.join(MODEL_DIR, "flood_scaler.pkl")
 
+    # --- Model Backends (see app/predictor.py) ---
+    # Supervised models ship with ai_training/; point SUPERVISED_MODEL_DIR
+    # elsewhere when deploying only the server directory.
+    SUPERVISED_MODEL_DIR = os.getenv(
+        "SUPERVISED_MODEL_DIR", os.path.join(BASE_DIR, "..", "ai_training")
+    )
+    # "pickle" loads the joblib files; "compiled" loads the NumPy exports
+    # from ai_training/export_models.py and never imports sklearn.
+    MODEL_RUNTIME = os.getenv("MODEL_RUNTIME", "pickle")
+    COMPILED_MODEL_DIR = os.path.join(MODEL_DIR, "compiled")
+    COMPILED_SCALER_PATH = os.path.join(COMPILED_MODEL_DIR, "scaler.npz")
+
+    MODEL_BACKENDS = {
+        "kmeans": {
+            "kind": "kmeans",
+            "path": KMEANS_MODEL_PATH,
+            "compiled_path": os.path.join(COMPILED_MODEL_DIR, "kmeans.npz"),
+        },
+        "isolation_forest": {
+            "kind": "isolation_forest",
+            "path": ISO_MODEL_PATH,
+            "compiled_path": os.path.join(COMPILED_MODEL_DIR, "isolation_forest.npz"),
+        },
+        "random_forest": {
+            "kind": "classifier",
+            "path": os.path.join(SUPERVISED_MODEL_DIR, "flood_rf_model.pkl"),
+            "compiled_path": os.path.join(COMPILED_MODEL_DIR, "random_forest.npz"),
+        },
+        "xgboost": {
+            "kind": "classifier",
+            "path": os.path.join(SUPERVISED_MODEL_DIR, "flood_xgb_model.pkl"),
+            "compiled_path": os.path.join(COMPILED_MODEL_DIR, "xgboost.npz"),
+        },
+        "mlp": {
+            "kind": "classifier",
+            "path": os.path.join(SUPERVISED_MODEL_DIR, "flood_mlp_model.pkl"),
+            "compiled_path": os.path.join(COMPILED_MODEL_DIR, "mlp.npz"),
+        },
+    }
+
+    # role -> backend name; these drive the response fields
+    PRIMARY_MODELS = {"risk": "kmeans", "anomaly": "isolation_forest"}
+
+    # Comma-separated backend names, e.g. ENSEMBLE_MODELS=random_forest,xgboost
+    # Ensemble members are averaged into `flood_probability` in the response;
+    # shadow models run in the background and only show up in /models/stats.
+    ENSEMBLE_MODELS = [n for n in os.getenv("ENSEMBLE_MODELS", "").split(",") if n]
+    SHADOW_MODELS = [n for n in os.getenv("SHADOW_MODELS", "").split(",") if n]
+
+    # Values for features the supervised models expect but the API can't supply
+    FEATURE_DEFAULTS = {"is_flood_prone": 0}
+
     # --- Data Path ---
     BARANGAY_CSV_PATH = os.path.join(CSV_DIR, "angeles_barangay_info_corrected_full.csv")
+    # Binary copy of the barangay list, rebuilt whenever the CSV is newer
+    BARANGAY_CACHE_PATH = os.getenv("BARANGAY_CACHE_PATH", os.path.join(CSV_DIR, "barangays.npz"))
+
+    # --- Request Coalescing (see app/coalesce.py) ---
+    # Workers share /predict_all results through lock files in this directory
+    COALESCE_LOCK_DIR = os.getenv(
+        "COALESCE_LOCK_DIR", os.path.join(tempfile.gettempdir(), "floodsight-coalesce")
+    )
+    # A waiting worker reuses a result finished up to this long before it arrived
+    COALESCE_SHARE_SECONDS = float(os.getenv("COALESCE_SHARE_SECONDS", "2"))
+
+    # --- Serving Mode (see app/serving.py) ---
+    # "swr" answers /predict_all from the last result and refreshes it in the
+    # background; "direct" computes on every request (coalesced).
+    SERVING_MODE = os.getenv("SERVING_MODE", "swr")
+    SWR_FRESH_SECONDS = float(os.getenv("SWR_FRESH_SECONDS", "60"))
+    SWR_MAX_STALE_SECONDS = float(os.getenv("SWR_MAX_STALE_SECONDS", "3600"))
+    SWR_WAIT_SECONDS = float(os.getenv("SWR_WAIT_SECONDS", "10"))
+
+    # --- Admission Control (per worker) ---
+    # Admission can only queue or shed requests that already hold a server
+    # thread, so gunicorn's --threads (procfile: 24) must exceed
+    # ADMISSION_MAX_CONCURRENT + ADMISSION_MAX_QUEUE (4 + 16). Otherwise the
+    # excess waits in gunicorn's own unbounded queue, where it is never shed.
+    # The spare threads keep /metrics/* answering while /predict_all is full.
+    ADMISSION_MAX_CONCURRENT = int(os.getenv("ADMISSION_MAX_CONCURRENT", "4"))
+    ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "16"))
+    ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "2"))
+
+    # --- Prediction Pipeline (see app/pipeline.py) ---
+    # Per-stage result caching; the barangay list never changes at runtime
+    PIPELINE_LOCATE_CACHE_SECONDS = float(os.getenv("PIPELINE_LOCATE_CACHE_SECONDS", "inf"))
+    PIPELINE_FETCH_CACHE_SECONDS = float(os.getenv("PIPELINE_FETCH_CACHE_SECONDS", "0"))
+
+    # --- Async Serving (see app/aio.py) ---
+    # Max concurrent Open-Meteo requests per process, and their timeout
+    UPSTREAM_CONCURRENCY = int(os.getenv("UPSTREAM_CONCURRENCY", "16"))
+    UPSTREAM_TIMEOUT = float(os.getenv("UPSTREAM_TIMEOUT", "10"))
+
+    # --- Profiling (see profiling.py) ---
+    # Off unless a token is set; requests then opt in with `X-Profile: sample|cprofile`
+    # plus `X-Profile-Token`, and /admin/profile captures time windows.
+    PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+    PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "floodsight-profiles"))
+    PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))
+    PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "300"))
 
     # --- Prediction Maps ---
     ANOMALY_MAP = {-1: "Potential Flood", 1: "Normal"}
@@ -0,0 +1,142 @@
+"""
+Per-barangay rolling rainfall features, shared by the API and the dataset scripts.
+
+Both paths push daily (precip, discharge) values into a FeatureStore and
+read back the same lag / rolling-sum features, so online and offline
+features are computed by one piece of code. Each barangay keeps a
+fixed-size ring buffer plus running 3- and 7-day sums, so adding a day
+(or revising today's partial value) is O(1).
+
+Standard library only: the dataset scripts import this module without the
+Flask app (they add server/ to sys.path, like the app's own `config`).
+"""
+import math
+import threading
+
+WINDOW = 7
+
+
+def _num(value) -> float:
+    """Missing values count as 0 in the sums (pandas rolling(min_periods=1) skips them)."""
+    if value is None:
+        return 0.0
+    value = float(value)
+    return 0.0 if math.isnan(value) else value
+
+
+class RollingFeatures:
+    """Ring buffer of the last WINDOW days for one location."""
+
+    __slots__ = ("precip", "count", "head", "sum3", "sum7", "last_day", "discharge")
+
+    def __init__(self):
+        self.precip = [0.0] * WINDOW   # raw values (NaN kept for lags)
+        self.count = 0                 # rows seen so far
+        self.head = -1                 # index of the newest value
+        self.sum3 = 0.0
+        self.sum7 = 0.0
+        self.last_day = None
+        self.discharge = None
+
+    def _back(self, n):
+        """Value `n` rows before the newest (0 = newest), or None if not seen yet."""
+        if n >= self.count:
+            return None
+        return self.precip[(self.head - n) % WINDOW]
+
+    def push(self, day, precip, discharge):
+        """Appends a new row and slides both windows."""
+        p = _num(precip)
+        # Values leaving the 3- and 7-row windows
+        if self.count >= 3:
+            self.sum3 -= _num(self._back(2))
+        if self.count >= 7:
+            self.sum7 -= _num(self._back(6))
+
+        self.head = (self.head + 1) % WINDOW
+        self.precip[self.head] = precip if precip is not None else float("nan")
+        self.count += 1
+        self.sum3 += p
+        self.sum7 += p
+        self.last_day = day
+        self.discharge = discharge
+
+    def revise(self, precip, discharge):
+        """Replaces the newest row's values (e.g. today's running total)."""
+        delta = _num(precip) - _num(self._back(0))
+        self.precip[self.head] = precip if precip is not None else float("nan")
+        self.sum3 += delta
+        self.sum7 += delta
+        self.discharge = discharge
+
+    def features(self) -> dict:
+        return {
+            "precip": self._back(0),
+            "precip_lag1": self._back(1),
+            "precip_lag2": self._back(2),
+            "precip_3d_sum": self.sum3 if self.count else None,
+            "precip_7d_sum": self.sum7 if self.count else None,
+            "river_discharge": self.discharge,
+        }
+
+
+class FeatureStore:
+    """Rolling features keyed by barangay (or any hashable location key)."""
+
+    def __init__(self):
+        self._series = {}
+        # Request threads and the background refresh update the same buffers
+        self._lock = threading.Lock()
+
+    def _get(self, key) -> RollingFeatures:
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = RollingFeatures()
+        return series
+
+    def update(self, key, day, precip, discharge=None) -> dict:
+        """
+        Online update for one day. Older days are ignored, the current day
+        is revised in place, and a newer day is pushed.
+        """
+        with self._lock:
+            return self._update(self._get(key), day, precip, discharge)
+
+    @staticmethod
+    def _update(series, day, precip, discharge) -> dict:
+        if series.last_day is None or day > series.last_day:
+            series.push(day, precip, discharge)
+        elif day == series.last_day:
+            series.revise(precip, discharge)
+        return series.features()
+
+    def ingest(self, key, days, precips, discharges=None) -> dict:
+        """Applies `update` for each day in order; returns the latest features."""
+        discharges = discharges if discharges is not None else [None] * len(days)
+        with self._lock:
+            series = self._get(key)
+            for day, precip, discharge in zip(days, precips, discharges):
+                # Skip anything already folded in, without re-revising history
+                if series.last_day is not None and day < series.last_day:
+                    continue
+                self._update(series, day, precip, discharge)
+            return series.features()
+
+    def features(self, key) -> dict:
+        return self._get(key).features()
+
+    def replay(self, keys, days, precips, discharges=None) -> dict:
+        """
+        Offline: feeds every row (already sorted by key, then day) through
+        the same update rule as the API and returns the feature columns in
+        row order. A repeated (key, day) revises that day instead of adding
+        another one, so lags always refer to the previous day.
+        """
+        columns = {name: [] for name in ("precip_lag1", "precip_lag2", "precip_3d_sum", "precip_7d_sum")}
+        discharges = discharges if discharges is not None else [None] * len(keys)
+        with self._lock:
+            for key, day, precip, discharge in zip(keys, days, precips, discharges):
+                feats = self._update(self._get(key), day, precip, discharge)
+                for name, values in columns.items():
+                    values.append(float("nan") if feats[name] is None else feats[name])
+        return columns
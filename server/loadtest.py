@@ -0,0 +1,51 @@
+"""
+Tiny load generator for comparing the WSGI and ASGI serving paths.
+
+    python loadtest.py http://localhost:5000/predict_all -n 500 -c 200
+
+Prints throughput, latency percentiles and status-code counts.
+"""
+import argparse
+import asyncio
+import time
+from collections import Counter
+
+import httpx
+
+
+async def run(url, total, concurrency, timeout):
+    limit = asyncio.Semaphore(concurrency)
+    latencies, statuses = [], Counter()
+
+    async with httpx.AsyncClient(timeout=timeout, limits=httpx.Limits(max_connections=concurrency)) as client:
+        async def one():
+            async with limit:
+                start = time.perf_counter()
+                try:
+                    res = await client.get(url)
+                    statuses[res.status_code] += 1
+                except httpx.HTTPError as e:
+                    statuses[type(e).__name__] += 1
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    pct = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+    print(f"requests:    {total} (concurrency {concurrency})")
+    print(f"elapsed:     {elapsed:.2f} s")
+    print(f"throughput:  {total / elapsed:.1f} req/s")
+    print(f"latency ms:  p50={pct(0.50):.1f} p95={pct(0.95):.1f} p99={pct(0.99):.1f} max={latencies[-1] * 1000:.1f}")
+    print(f"statuses:    {dict(statuses)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("url")
+    parser.add_argument("-n", "--requests", type=int, default=200)
+    parser.add_argument("-c", "--concurrency", type=int, default=50)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.requests, args.concurrency, args.timeout))
@@ -0,0 +1,277 @@
+"""
+Opt-in profiling for the API workers and the dataset scripts.
+
+Two collectors:
+
+- "sample": a background thread snapshots the target threads' stacks every
+  `interval` seconds (sys._current_frames) and counts them as collapsed
+  stacks, one `frame;frame;frame count` line each. Feed the .collapsed file
+  to flamegraph.pl or drop it into speedscope. Overhead is paid only while
+  a capture runs and scales with the interval, not with call counts.
+- "cprofile": deterministic cProfile for one thread, saved as .pstats
+  (open with `python -m pstats` or snakeviz) plus a text summary.
+
+The dataset scripts are profiled from the command line (from server/; the
+script runs in its own directory, since they open cwd-relative paths):
+
+    python profiling.py ../dataset/merge.py
+    python profiling.py --mode cprofile --out /tmp/prof ../dataset/process_rainfall.py
+
+Only one cProfile capture can run per process (Python 3.12+ refuses a
+second profiler); CallProfiler.start raises ProfilerBusy instead.
+
+Standard library only, like feature_store.py, so the scripts can use it
+without the Flask app.
+"""
+import argparse
+import cProfile
+import io
+import itertools
+import os
+import pstats
+import runpy
+import sys
+import threading
+import time
+from collections import Counter
+
+MODES = ("sample", "cprofile")
+
+# One cProfile capture per process at a time
+_CPROFILE_LOCK = threading.Lock()
+
+# Suffix for output_base names; next() on a count is atomic under the GIL
+_OUTPUT_SEQ = itertools.count(1)
+
+
+class ProfilerBusy(RuntimeError):
+    """Raised when a cProfile capture is requested while another one runs."""
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler driven by a sampler thread.
+
+    `thread_ids=None` samples every thread except the sampler itself (a time
+    window on a live worker); pass the request thread's id to profile one
+    request. Each stack is rooted at its thread name, so the flamegraph
+    separates request threads from the background refresh.
+    """
+
+    def __init__(self, interval=0.005, thread_ids=None):
+        self.interval = interval
+        self.thread_ids = None if thread_ids is None else set(thread_ids)
+        self.stacks = Counter()
+        self.samples = 0
+        self.started_at = None
+        self.duration = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="profiler-sampler")
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration = time.perf_counter() - self.started_at
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own or (self.thread_ids is not None and ident not in self.thread_ids):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's collapsed-stack format, heaviest stacks first."""
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + "\n"
+
+    def save(self, path_base) -> list:
+        path = f"{path_base}.collapsed"
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.collapsed())
+        return [path]
+
+    def summary(self, limit=15) -> str:
+        """Top functions by self samples (leaf frames)."""
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        total = sum(leaves.values()) or 1
+        lines = [f"{self.samples} samples over {self.duration or 0:.2f}s (interval {self.interval * 1000:g}ms)"]
+        lines += [f"{100 * n / total:6.1f}%  {label}" for label, n in leaves.most_common(limit)]
+        return "\n".join(lines)
+
+
+class CallProfiler:
+    """cProfile with the same start/stop/save interface as SamplingProfiler."""
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+        self.duration = None
+        self._started_at = None
+
+    def start(self):
+        if not _CPROFILE_LOCK.acquire(blocking=False):
+            raise ProfilerBusy("another cProfile capture is running")
+        self._started_at = time.perf_counter()
+        try:
+            self.profile.enable()
+        except BaseException:
+            _CPROFILE_LOCK.release()
+            raise
+        return self
+
+    def stop(self):
+        try:
+            self.profile.disable()
+        finally:
+            _CPROFILE_LOCK.release()
+        self.duration = time.perf_counter() - self._started_at
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def save(self, path_base) -> list:
+        self.profile.dump_stats(f"{path_base}.pstats")
+        with open(f"{path_base}.txt", "w", encoding="utf-8") as f:
+            f.write(self.summary(limit=60))
+        return [f"{path_base}.pstats", f"{path_base}.txt"]
+
+    def summary(self, limit=15) -> str:
+        out = io.StringIO()
+        pstats.Stats(self.profile, stream=out).sort_stats("cumulative").print_stats(limit)
+        return out.getvalue()
+
+
+def make_profiler(mode="sample", interval=0.005, thread_ids=None):
+    if mode == "sample":
+        return SamplingProfiler(interval, thread_ids)
+    if mode == "cprofile":
+        return CallProfiler()
+    raise ValueError(f"Unknown profiling mode {mode!r}; expected one of {MODES}")
+
+
+def output_base(out_dir, label) -> str:
+    """
+    `<out_dir>/<label>-<timestamp>-<pid>-<thread>-<n>`; the directory is
+    created if needed. The thread id and per-process counter keep captures
+    started in the same second (concurrent requests) from sharing a name.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    return os.path.join(
+        out_dir, f"{label}-{stamp}-{os.getpid()}-{threading.get_ident()}-{next(_OUTPUT_SEQ)}"
+    )
+
+
+class CaptureWindow:
+    """
+    One time-window capture of every thread in this process at a time.
+
+    Used by the admin endpoint on a live worker: `start(seconds)` returns
+    immediately and the profile is written when the window closes.
+    """
+
+    def __init__(self, out_dir, interval=0.005, max_seconds=300):
+        self.out_dir = out_dir
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self._lock = threading.Lock()
+        self._active = None  # (profiler, ends_at)
+        self.last_paths = []
+
+    def start(self, seconds) -> float:
+        """Starts a capture; returns its length. Raises RuntimeError if one is running."""
+        seconds = min(float(seconds), self.max_seconds)
+        with self._lock:
+            if self._active is not None:
+                raise RuntimeError("a capture is already running")
+            profiler = SamplingProfiler(self.interval).start()
+            self._active = (profiler, time.time() + seconds)
+        timer = threading.Timer(seconds, self._finish, args=(profiler,))
+        timer.daemon = True
+        timer.start()
+        return seconds
+
+    def _finish(self, profiler):
+        profiler.stop()
+        try:
+            self.last_paths = profiler.save(output_base(self.out_dir, "window"))
+            print(f"--- [INFO] Profile window written to {self.last_paths[0]} ---")
+        except OSError as e:
+            print(f"--- [ERROR] Could not write profile window: {e} ---")
+        finally:
+            with self._lock:
+                self._active = None
+
+    def status(self) -> dict:
+        with self._lock:
+            active = self._active
+        return {
+            "running": active is not None,
+            "seconds_left": None if active is None else max(0.0, round(active[1] - time.time(), 1)),
+            "last_paths": self.last_paths,
+        }
+
+
+# --- Command line: profile a script (e.g. the dataset pipeline) ---
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile a Python script and write flamegraph/pstats output.")
+    parser.add_argument("script", help="Path of the script to run")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="Arguments passed to the script")
+    parser.add_argument("--mode", choices=MODES, default="sample")
+    parser.add_argument("--interval", type=float, default=0.005, help="Sampling interval in seconds")
+    parser.add_argument("--out", default="profiles", help="Output directory")
+    opts = parser.parse_args()
+
+    script = os.path.abspath(opts.script)
+    out_dir = os.path.abspath(opts.out)
+    label = os.path.splitext(os.path.basename(script))[0]
+    profiler = make_profiler(opts.mode, opts.interval)
+
+    # Run the script as __main__ from its own directory, as if started directly
+    sys.argv = [script, *opts.args]
+    sys.path.insert(0, os.path.dirname(script))
+    os.chdir(os.path.dirname(script))
+    try:
+        with profiler:
+            runpy.run_path(script, run_name="__main__")
+    finally:
+        paths = profiler.save(output_base(out_dir, label))
+        print(profiler.summary())
+        print(f"--- [INFO] Profile written to {', '.join(paths)} ---")
+
+
+if __name__ == "__main__":
+    main()